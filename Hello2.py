@@ -1,19 +1,12 @@
 import altair as alt
-import numpy as np
 import pandas as pd
 import streamlit as st
 
-# Function to calculate balance at each year
-def calculate_balance(current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate, income_replacement_ratio, life_expectancy):
-    years = np.arange(current_age, life_expectancy + 1)
-    balance = np.zeros(len(years))
-    balance[0] = super_bal
-    annual_expenses = super_bal * (income_replacement_ratio / 100)
-    for i in range(1, len(years)):
-        balance[i] = (balance[i - 1] * (1 + roi / 100) + annual_contribution) / (1 + inflation_rate / 100)
-        if i >= retirement_age - current_age:
-            balance[i] -= annual_expenses
-    return years, balance
+from charts import montecarlo_section
+from projection import calculate_balance
+from timing import set_page, span
+
+set_page(__file__)
 
 # Streamlit app
 st.title("Retirement Cashflow Modelll")
@@ -28,7 +21,8 @@ income_replacement_ratio = st.slider("Income replacement ratio (%)", 50, 150, 70
 life_expectancy = st.slider("Life expectancy", 80, 100, 85)
 
 years, balance = calculate_balance(current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate, income_replacement_ratio, life_expectancy)
-df = pd.DataFrame({"Year": years, "Balance": balance})
+with span("frame"):
+    df = pd.DataFrame({"Year": years, "Balance": balance})
 
 st.write("### Cashflow Model")
 
@@ -43,4 +37,8 @@ chart = alt.Chart(df).mark_bar().encode(
     height=400
 )
 
-st.altair_chart(chart, use_container_width=True)
+with span("render"):
+    st.altair_chart(chart, use_container_width=True)
+
+montecarlo_section(current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate,
+                   income_replacement_ratio, life_expectancy)
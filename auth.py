@@ -0,0 +1,148 @@
+import os
+import sys
+import threading
+
+import streamlit_authenticator as stauth
+import yaml
+from yaml.loader import SafeLoader
+
+from result_cache import ResultCache
+from users import UserMapping, UserStore
+
+
+# Shared authentication setup for the pages.
+#
+# The config file is parsed once per server process and again only when the
+# file is replaced or modified, and plain text passwords are bcrypt-hashed at
+# that point instead of in every new session. Decoded re-authentication
+# cookies are kept in a bounded cache, so a returning session does not check
+# the token signature again. The widgets themselves still belong to each
+# rerun, so every rerun gets a new Authenticate around the shared config.
+#
+# With FINOBI_USERS_DB set, users come from that SQLite user store (see
+# users.py) instead of the config's credentials, and are looked up one at a
+# time as they log in. A database file that does not exist yet is created
+# with the config's users; add more with `python users.py DB users.csv`.
+
+
+class CredentialStore:
+    """Authentication config loaded from a YAML file, reloaded when the file changes.
+
+    With a `user_store`, the config's credentials are replaced by the store's users.
+    """
+
+    def __init__(self, path, user_store=None):
+        self.path = path
+        self.user_store = user_store
+        self._version = None
+        self._config = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Return the config, with every password hashed."""
+        stat = os.stat(self.path)
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if version != self._version:
+                config = _read_config(self.path)
+                if self.user_store is not None:
+                    config["credentials"] = {"usernames": UserMapping(self.user_store)}
+                else:
+                    stauth.Hasher.hash_passwords(config["credentials"])
+                self._config, self._version = config, version
+                # Tokens may have been signed with a key that is no longer valid
+                verified_tokens.clear()
+            return self._config
+
+
+# Decoded re-authentication cookies by token; expiry dates inside them are
+# still checked on every use
+verified_tokens = ResultCache(maxsize=10000, ttl=60 * 60)
+
+def _read_config(path):
+    with open(path, "r") as file:
+        return yaml.load(file, Loader=SafeLoader)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def credential_store(path="./config.yaml"):
+    """Return the process-wide CredentialStore for `path`."""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            users_db = os.environ.get("FINOBI_USERS_DB")
+            user_store = None
+            if users_db:
+                new = not os.path.exists(users_db)
+                user_store = UserStore(users_db)
+                if new:
+                    user_store.import_credentials(_read_config(path)["credentials"])
+            _stores[path] = CredentialStore(path, user_store)
+        return _stores[path]
+
+
+def _cache_token_checks(authenticator):
+    # Wraps a private method of streamlit-authenticator 0.4.2 (pinned in
+    # requirements.txt); with any other layout tokens are decoded uncached
+    cookie_model = getattr(getattr(authenticator, "cookie_controller", None), "cookie_model", None)
+    decode = getattr(cookie_model, "_token_decode", None)
+    if decode is None:
+        return False
+
+    def token_decode():
+        payload = verified_tokens.get(cookie_model.token)
+        if payload is None:
+            payload = decode()
+            if payload:
+                verified_tokens.put(cookie_model.token, payload)
+        return payload
+
+    cookie_model._token_decode = token_decode
+    return True
+
+
+def get_authenticator(path="./config.yaml"):
+    """Return an Authenticate for this rerun, backed by the shared credential store."""
+    store = credential_store(path)
+    config = store.load()
+    if store.user_store is None:
+        authenticator = _authenticate(config, config['credentials'])
+    else:
+        # The library copies every user into a new dict when it starts, so
+        # it starts with none and is then given the store through the
+        # credentials dict it keeps
+        credentials = {"usernames": {}}
+        authenticator = _authenticate(config, credentials)
+        credentials["usernames"] = config['credentials']['usernames']
+        if not _uses_credentials(authenticator, credentials):
+            # Not the layout of the pinned version: let it copy the users
+            authenticator = _authenticate(config, {"usernames": config['credentials']['usernames']})
+    _cache_token_checks(authenticator)
+    return authenticator
+
+
+def _authenticate(config, credentials):
+    return stauth.Authenticate(
+        credentials,
+        config['cookie']['name'],
+        config['cookie']['key'],
+        config['cookie']['expiry_days'],
+        auto_hash=False,
+    )
+
+
+def _uses_credentials(authenticator, credentials):
+    model = getattr(getattr(authenticator, "authentication_controller", None), "authentication_model", None)
+    return getattr(model, "credentials", None) is credentials
+
+
+if __name__ == "__main__":
+    # Hash the plain text passwords in a config file in place
+    path = sys.argv[1] if len(sys.argv) > 1 else "./config.yaml"
+    config = _read_config(path)
+    stauth.Hasher.hash_passwords(config["credentials"])
+    with open(path, "w") as file:
+        yaml.dump(config, file, default_flow_style=False)
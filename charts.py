@@ -0,0 +1,120 @@
+import streamlit as st
+
+from lazy_import import lazy_import
+from montecarlo import simulate_balance
+from projection import CASHFLOW_METRICS
+from result_cache import ResultCache, cached
+from timing import span
+
+alt = lazy_import("altair")
+pd = lazy_import("pandas")
+
+
+# Chart specs for the calculator pages.
+#
+# Building the DataFrame and the Altair chart and serializing it to Vega-Lite
+# costs more than the projection itself, so the serialized spec is cached on a
+# digest of the plotted arrays and the chart options. A rerun with unchanged
+# data hands st.vega_lite_chart the spec from the cache. Cached specs are
+# shared between sessions and must be treated as read-only. Altair and pandas
+# are only imported when a spec is first built.
+#
+# montecarlo_section draws the Monte Carlo part of the retirement pages.
+
+
+chart_cache = ResultCache(maxsize=1024, ttl=60 * 60)
+
+
+@span("chart_spec")
+@cached(chart_cache)
+def yearly_bar_chart_spec(years, values, title, width=700, height=200):
+    """Return the Vega-Lite spec of a bar chart of `values` by year."""
+    df = pd.DataFrame({
+        "Year": years,
+        title: values
+    })
+    chart = alt.Chart(df).mark_bar().encode(
+        x='Year',
+        y=alt.Y(title, axis=alt.Axis(title=f"{title} ($)", format="$,.0f")),
+        tooltip=['Year', alt.Tooltip(title, format='$,.0f')]
+    ).properties(
+        width=width,
+        height=height,
+        title=title
+    )
+    return chart.to_dict()
+
+
+@span("chart_spec")
+@cached(chart_cache)
+def cashflow_chart_spec(frame, metrics=CASHFLOW_METRICS, width=700, height=200):
+    """Return the Vega-Lite spec of one bar chart per metric, faceted from a single dataset.
+
+    `frame` is a calculate_cashflow_frame result; the browser folds its metric
+    columns into rows, so the Year column and the data are sent only once.
+    """
+    chart = alt.Chart(frame).transform_fold(
+        list(metrics),
+        as_=["Metric", "Value"]
+    ).mark_bar().encode(
+        x='Year:Q',
+        y=alt.Y('Value:Q', axis=alt.Axis(title="($)", format="$,.0f")),
+        tooltip=['Year:Q', 'Metric:N', alt.Tooltip('Value:Q', format='$,.0f')]
+    ).properties(
+        width=width,
+        height=height
+    ).facet(
+        row=alt.Row('Metric:N', sort=list(metrics), title=None)
+    ).resolve_scale(
+        y='independent'
+    )
+    return chart.to_dict()
+
+
+def montecarlo_section(current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate,
+                       income_replacement_ratio, life_expectancy):
+    """Draw the Monte Carlo section of a retirement page: its sliders, percentile bands and ruin probability."""
+    st.write("### Monte Carlo Simulation")
+
+    # Stochastic mode: draw yearly returns and inflation instead of fixed rates
+    if not st.checkbox("Simulate market uncertainty"):
+        return
+    roi_volatility = st.slider("Return volatility (%)", 0, 30, 10)
+    inflation_volatility = st.slider("Inflation volatility (%)", 0, 5, 1)
+    paths = st.select_slider("Simulated paths", [10000, 100000, 1000000], 10000)
+
+    summary = simulate_balance(current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate,
+                               income_replacement_ratio, life_expectancy, roi_volatility, inflation_volatility,
+                               paths=paths, seed=0, parallel=paths > 100000)
+    bands = summary.bands((0.05, 0.5, 0.95))
+    df_bands = pd.DataFrame({
+        "Year": summary.years,
+        "P5": bands[0.05],
+        "P50": bands[0.5],
+        "P95": bands[0.95],
+        "Probability of ruin": summary.ruin_probability(),
+    })
+
+    band = alt.Chart(df_bands).mark_area(opacity=0.3).encode(
+        x="Year:O",
+        y=alt.Y("P5:Q", title="Balance"),
+        y2="P95:Q"
+    )
+    median = alt.Chart(df_bands).mark_line().encode(
+        x="Year:O",
+        y="P50:Q",
+        tooltip=[alt.Tooltip("Year:O", title="Year")] + [alt.Tooltip(f"{p}:Q", format=".2f") for p in ("P5", "P50", "P95")]
+    )
+    with span("render"):
+        st.altair_chart((band + median).properties(width=700, height=400), use_container_width=True)
+
+    ruin = alt.Chart(df_bands).mark_line().encode(
+        x="Year:O",
+        y=alt.Y("Probability of ruin:Q", axis=alt.Axis(format="%")),
+        tooltip=[alt.Tooltip("Year:O", title="Year"), alt.Tooltip("Probability of ruin:Q", format=".1%")]
+    ).properties(
+        width=700,
+        height=200
+    )
+    with span("render"):
+        st.altair_chart(ruin, use_container_width=True)
@@ -0,0 +1,311 @@
+import asyncio
+import hashlib
+import queue
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from lazy_import import lazy_import
+from result_cache import ResultCache, cache_key
+
+openai = lazy_import("openai")
+
+
+# Chat completions for the chatbot page.
+#
+# Requests run on one background event loop per server process, through
+# AsyncOpenAI clients pooled per API key and base URL, so connections are
+# reused across prompts and sessions and no script thread blocks on the
+# network. Streamed tokens are handed to the script thread through a queue as
+# they arrive, ready for st.write_stream. The base URL defaults to the
+# OPENAI_BASE_URL environment variable, which can point at chat_stub.py for
+# offline runs. The openai package is only imported with the first request.
+#
+# ChatHistory bounds what a session keeps and sends: recent messages are kept
+# in full within a token budget and older ones are folded into a short
+# summary sent as a system message.
+#
+# ResponseCache answers repeated questions without a request. Replies are
+# keyed on the model and the normalized tail of the conversation, shared by
+# all sessions. An optional similarity index over local embeddings lets
+# rephrasings of a cached question hit as well; it is off for the chatbot,
+# since questions that differ only in an age or a rate look alike to it but
+# need different answers.
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def event_loop():
+    """Return the background event loop shared by every session, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="chat-event-loop", daemon=True).start()
+        return _loop
+
+
+MAX_CLIENTS = 256
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def client_for(api_key, base_url=None):
+    """Return the pooled client for `api_key`, closing the least recently used beyond MAX_CLIENTS."""
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = openai.AsyncOpenAI(api_key=api_key, base_url=base_url)
+        _clients.move_to_end(key)
+        while len(_clients) > MAX_CLIENTS:
+            _, evicted = _clients.popitem(last=False)
+            asyncio.run_coroutine_threadsafe(evicted.close(), event_loop())
+        return client
+
+
+_done = object()
+
+
+async def _produce(tokens, client, model, messages, options):
+    try:
+        stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **options)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                tokens.put(chunk.choices[0].delta.content)
+    except Exception as error:
+        tokens.put(error)
+    finally:
+        tokens.put(_done)
+
+
+def stream_chat(api_key, model, messages, base_url=None, timeout=60, **options):
+    """Yield the text of a chat completion as it arrives.
+
+    The request runs on the background event loop; `timeout` bounds the wait
+    for each token. Errors from the API are raised here, and closing the
+    generator cancels the request.
+    """
+    tokens = queue.Queue()
+    client = client_for(api_key, base_url)
+    future = asyncio.run_coroutine_threadsafe(
+        _produce(tokens, client, model, list(messages), options), event_loop(),
+    )
+    try:
+        while True:
+            token = tokens.get(timeout=timeout)
+            if token is _done:
+                return
+            if isinstance(token, Exception):
+                raise token
+            yield token
+    finally:
+        future.cancel()
+
+
+def complete_chat(api_key, model, messages, base_url=None, timeout=60, **options):
+    """Return the whole text of a chat completion."""
+    return "".join(stream_chat(api_key, model, messages, base_url, timeout, **options))
+
+
+def estimate_tokens(text):
+    """Roughly count the tokens in `text` (about four characters each), without a tokenizer."""
+    return len(text) // 4 + 1
+
+
+def summarize_turns(summary, messages, max_chars=200):
+    """Extend `summary` with one shortened line per message."""
+    lines = [summary] if summary else []
+    for message in messages:
+        content = " ".join(message["content"].split())
+        if len(content) > max_chars:
+            content = content[:max_chars - 3] + "..."
+        lines.append(f"{message['role']}: {content}")
+    return "\n".join(lines)
+
+
+class ChatHistory:
+    """Conversation kept within a token budget for the context sent with each prompt.
+
+    Recent messages are kept in full while they fit in `budget` tokens; the
+    oldest are then folded into a summary of at most `summary_budget` tokens
+    (dropping its oldest lines), so memory and request size stay bounded
+    however long the session runs. `summarize(summary, messages)` returns the
+    new summary; by default each folded message keeps one shortened line.
+    """
+
+    # Tokens added by the API for each message's role and separators
+    message_overhead = 4
+
+    def __init__(self, budget=3000, summary_budget=500, count_tokens=estimate_tokens, summarize=summarize_turns):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.count_tokens = count_tokens
+        self.summarize = summarize
+        self.messages = []
+        self.summary = ""
+        self.compacted = 0
+        self._tokens = 0
+
+    def _cost(self, message):
+        return self.count_tokens(message["content"]) + self.message_overhead
+
+    def append(self, role, content):
+        message = {"role": role, "content": content}
+        self.messages.append(message)
+        self._tokens += self._cost(message)
+        self._compact()
+
+    def _compact(self):
+        # Fold the oldest messages into the summary until the rest fit, always
+        # keeping the latest message in full
+        folded = 0
+        while self._tokens > self.budget and len(self.messages) - folded > 1:
+            self._tokens -= self._cost(self.messages[folded])
+            folded += 1
+        if not folded:
+            return
+        summary = self.summarize(self.summary, self.messages[:folded])
+        lines = summary.split("\n")
+        while len(lines) > 1 and self.count_tokens("\n".join(lines)) > self.summary_budget:
+            lines.pop(0)
+        self.summary = "\n".join(lines)
+        del self.messages[:folded]
+        self.compacted += folded
+
+    def context(self):
+        """Return the messages to send: the summary of earlier turns, if any, then the recent ones."""
+        if not self.summary:
+            return list(self.messages)
+        summary = {"role": "system", "content": "Summary of the earlier conversation:\n" + self.summary}
+        return [summary, *self.messages]
+
+
+def normalize(text):
+    """Lower-case `text` and reduce it to words separated by single spaces."""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def hashed_embedding(text, dimensions=512):
+    """Embed `text` locally as a unit vector of hashed character trigram counts."""
+    text = f" {normalize(text)} "
+    vector = np.zeros(dimensions)
+    for i in range(len(text) - 2):
+        digest = hashlib.blake2b(text[i:i + 3].encode(), digest_size=8).digest()
+        vector[int.from_bytes(digest, "little") % dimensions] += 1
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ResponseCache:
+    """Cache of complete chat replies in front of stream_chat.
+
+    Replies are keyed on the model, the last `tail` messages, normalized,
+    and the numbers in the last message, signs included, and kept in a ResultCache with LRU eviction and an optional TTL. With
+    `embed`, a text -> unit vector function such as hashed_embedding, a miss
+    falls back to the cached conversation whose last message is most similar
+    by cosine similarity, if that reaches `threshold` and the conversation
+    has the same earlier messages and the same numbers in its last message.
+    """
+
+    def __init__(self, maxsize=1024, ttl=24 * 60 * 60, tail=2, embed=None, threshold=0.97):
+        self.tail = tail
+        self.embed = embed
+        self.threshold = threshold
+        self.replies = ResultCache(maxsize=maxsize, ttl=ttl)
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        # Embeddings of the last message of cached conversations, with the
+        # keys of the conversations and of their earlier messages, in a ring
+        # of `maxsize` rows
+        self._keys = [None] * maxsize
+        self._contexts = [None] * maxsize
+        self._vectors = None
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _conversation(self, model, messages):
+        tail = [(message["role"], normalize(message["content"])) for message in messages[-self.tail:]]
+        # Questions are only interchangeable if their numbers are the same,
+        # signs and decimal points included, which normalize drops
+        numbers = re.findall(r"[-+\u2212]?\d+(?:[.,]\d+)*", messages[-1]["content"])
+        return cache_key("chat", model, tail, numbers), cache_key("chat", model, tail[:-1], numbers), tail[-1][1]
+
+    def get(self, model, messages):
+        """Return the cached reply to `messages`, or None."""
+        key, context, text = self._conversation(model, messages)
+        reply = self.replies.get(key)
+        similar = reply is None and self.embed is not None
+        if similar:
+            reply = self._get_similar(context, self.embed(text))
+        with self._lock:
+            if reply is None:
+                self.misses += 1
+            elif similar:
+                self.similar_hits += 1
+            else:
+                self.exact_hits += 1
+        return reply
+
+    def _get_similar(self, context, vector):
+        with self._lock:
+            if self._vectors is None:
+                return None
+            same_context = np.array([c == context for c in self._contexts])
+            similarity = np.where(same_context, self._vectors @ vector, -1.0)
+            best = int(np.argmax(similarity))
+            if similarity[best] < self.threshold or self._keys[best] is None:
+                return None
+            key = self._keys[best]
+        return self.replies.get(key)
+
+    def put(self, model, messages, reply):
+        key, context, text = self._conversation(model, messages)
+        self.replies.put(key, reply)
+        if self.embed is None:
+            return
+        vector = self.embed(text)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((len(self._keys), len(vector)))
+            self._keys[self._next] = key
+            self._contexts[self._next] = context
+            self._vectors[self._next] = vector
+            self._next = (self._next + 1) % len(self._keys)
+
+    def stream(self, api_key, model, messages, **options):
+        """Yield the reply to `messages`: all at once from the cache, otherwise streamed and then cached."""
+        messages = list(messages)
+        reply = self.get(model, messages)
+        if reply is not None:
+            yield reply
+            return
+        tokens = []
+        for token in stream_chat(api_key, model, messages, **options):
+            tokens.append(token)
+            yield token
+        self.put(model, messages, "".join(tokens))
+
+    def stats(self):
+        """Return the cache's size, hit and eviction counters."""
+        replies = self.replies.stats()
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "size": replies["size"],
+            "maxsize": replies["maxsize"],
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": replies["evictions"],
+            "expirations": replies["expirations"],
+            "hit_rate": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache()
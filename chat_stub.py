@@ -0,0 +1,92 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local stand-in for the OpenAI chat completions endpoint.
+#
+# Answers POST /v1/chat/completions by echoing the last user message, either
+# as one JSON response or, with "stream": true, as server-sent events with
+# one chunk per word. Run it with `python chat_stub.py [port]` and set
+# OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 to use the chatbot offline.
+
+
+def reply_to(messages):
+    """Return the stub's answer to a conversation."""
+    prompts = [message["content"] for message in messages if message["role"] == "user"]
+    return f"You said: {prompts[-1]}" if prompts else "How can I help you?"
+
+
+class CompletionsHandler(BaseHTTPRequestHandler):
+    # Seconds between streamed chunks
+    delay = 0.02
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        answer = reply_to(request["messages"])
+        completion = {
+            "id": "chatcmpl-stub",
+            "created": int(time.time()),
+            "model": request["model"],
+        }
+        if request.get("stream"):
+            self._stream(completion, answer)
+        else:
+            self._send_json({
+                **completion,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }],
+            })
+
+    def _send_json(self, body):
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, completion, answer):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            self._event({**completion, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            time.sleep(self.delay)
+        self._event({**completion, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _event(self, body):
+        self.wfile.write(b"data: " + json.dumps(body).encode() + b"\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=0):
+    """Start the stub on a background thread and return the server; port 0 picks a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), CompletionsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", int(sys.argv[1]) if len(sys.argv) > 1 else 8000), CompletionsHandler)
+    print(f"OPENAI_BASE_URL=http://127.0.0.1:{server.server_port}/v1")
+    server.serve_forever()
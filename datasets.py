@@ -0,0 +1,131 @@
+import os
+import sys
+import tempfile
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+
+# Local dataset store for the demo pages.
+#
+# Each dataset is imported once from its source (a URL or a local copy of it)
+# into an uncompressed Arrow IPC file under DATA_DIR. Loading memory-maps the
+# file, so reads are zero-copy and the pages are shared through the OS page
+# cache by every server process on the machine, instead of each process
+# downloading and parsing JSON or gzipped CSV. Nodes without network access
+# are provisioned by copying DATA_DIR or running `python datasets.py` where
+# the sources are reachable. A dataset that is neither in the store nor
+# readable from its source raises DatasetUnavailableError.
+
+
+DATA_DIR = os.environ.get("FINOBI_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+_EXAMPLE_DATA_URL = "https://raw.githubusercontent.com/streamlit/example-data/master/hello/v1/"
+
+# Dataset name -> (source, reader)
+SOURCES = {
+    "bike_rental_stats": (_EXAMPLE_DATA_URL + "bike_rental_stats.json", pd.read_json),
+    "bart_stop_stats": (_EXAMPLE_DATA_URL + "bart_stop_stats.json", pd.read_json),
+    "bart_path_stats": (_EXAMPLE_DATA_URL + "bart_path_stats.json", pd.read_json),
+    "agri": ("https://streamlit-demo-data.s3-us-west-2.amazonaws.com/agri.csv.gz", pd.read_csv),
+}
+
+
+class DatasetUnavailableError(Exception):
+    """A dataset is missing from the store and its source cannot be read."""
+
+    def __init__(self, name, source, reason):
+        super().__init__(f"Cannot import dataset {name!r} from {source}: {reason}")
+        self.name = name
+        self.source = source
+        self.reason = reason
+
+
+def dataset_path(name):
+    return os.path.join(DATA_DIR, name + ".arrow")
+
+
+def import_dataset(name, source=None):
+    """Read a dataset from its source, or from `source` if given, into the store.
+
+    Raises DatasetUnavailableError if the source cannot be reached or read.
+    """
+    default_source, reader = SOURCES[name]
+    source = source or default_source
+    try:
+        frame = reader(source)
+    except (OSError, ValueError) as error:
+        # URLError and HTTPError for URLs, FileNotFoundError for local copies
+        # (and for URLs in some pandas versions), ValueError for bad content
+        raise DatasetUnavailableError(name, source, error) from error
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    # Write next to the target and rename, so readers never see a partial file
+    fd, temporary = tempfile.mkstemp(dir=DATA_DIR, prefix=".tmp-")
+    os.close(fd)
+    with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temporary, dataset_path(name))
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def _load(name):
+    path = dataset_path(name)
+    if not os.path.exists(path):
+        import_dataset(name)
+    stat = os.stat(path)
+    version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _loaded_lock:
+        loaded = _loaded.get(name)
+        if loaded is None or loaded[0] != version:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            loaded = _loaded[name] = (version, table, {})
+        return loaded
+
+
+def load_table(name):
+    """Return a dataset as an Arrow table memory-mapped from the store.
+
+    Datasets missing from the store are imported from their source first,
+    raising DatasetUnavailableError if that fails.
+    """
+    return _load(name)[1]
+
+
+def dataset_version(name):
+    """Return the (inode, mtime, size) of a dataset's file, which changes whenever the dataset is imported again."""
+    return _load(name)[0]
+
+
+def load_derived(name, key, compute):
+    """Return `compute(table)` for a dataset, computed once per process and version of the file.
+
+    `key` identifies the computation among those derived from the dataset.
+    The result is shared by every caller and must not be modified in place.
+    """
+    _, table, derived = _load(name)
+    with _loaded_lock:
+        if key not in derived:
+            derived[key] = compute(table)
+        return derived[key]
+
+
+def load_frame(name):
+    """Return a dataset as a shared DataFrame (see load_derived)."""
+    return load_derived(name, "frame", lambda table: table.to_pandas())
+
+
+def load_records(name):
+    """Return a dataset as a shared list of row dicts, the form map layers send to the browser."""
+    return load_derived(name, "records", lambda table: table.to_pylist())
+
+
+if __name__ == "__main__":
+    # Import the named datasets (all by default) into DATA_DIR
+    for name in sys.argv[1:] or SOURCES:
+        import_dataset(name)
+        print(f"{name}: {dataset_path(name)}")
@@ -0,0 +1,186 @@
+import io
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from lazy_import import lazy_import
+from result_cache import DiskCache, ResultCache, cache_key
+
+# Only needed to encode frames missing from both caches
+Image = lazy_import("PIL.Image")
+
+
+# Julia set renderer for the animation demo.
+#
+# Only pixels that have not escaped yet are iterated: after every step the
+# surviving values and their flat pixel indices are compacted into the front
+# of a pair of preallocated buffers, so the work per step shrinks with the
+# active set instead of covering the whole grid. Escape is tested on the
+# squared magnitude, which avoids the square root in np.abs.
+#
+# render_frames renders the frames of an animation ahead of playback on a
+# shared thread pool (NumPy releases the GIL in the array operations) and
+# hands them back in order, keeping only a bounded number in flight.
+# Finished frames are PNG-encoded 8-bit images, cached in memory and on disk
+# under (separation, iterations, frame), so repeated runs with the same
+# sliders only read them back.
+
+
+class JuliaRenderer:
+    """Render escape-count frames of z -> z**2 + c over a fixed grid.
+
+    The grid and all working buffers are allocated once and reused by every
+    call to render, so a renderer must not be shared between threads.
+    """
+
+    def __init__(self, width=960, height=640, scale=400):
+        x = np.linspace(-width / scale, width / scale, num=width)
+        y = np.linspace(-height / scale, height / scale, num=height)
+        self.shape = (height, width)
+        self._z0 = (x[np.newaxis, :] + 1j * y[:, np.newaxis]).ravel()
+        self._pixels = np.arange(self._z0.size)
+        size = self._z0.size
+        # Pairs of buffers: each step compacts from one into the other
+        self._z = (np.empty(size, dtype=complex), np.empty(size, dtype=complex))
+        self._index = (np.empty(size, dtype=np.intp), np.empty(size, dtype=np.intp))
+        self._magnitude = np.empty(size)
+        self._imag = np.empty(size)
+        self._alive = np.empty(size, dtype=bool)
+        self._counts = np.zeros(self.shape)
+
+    def render(self, c, iterations):
+        """Return the last iteration each pixel was still bounded, as a (height x width) array.
+
+        Matches the escape counts of the original demo loop. The returned
+        array is reused by the next call.
+        """
+        counts = self._counts.ravel()
+        counts.fill(0)
+        active = self._z0.size
+        z, index = self._z[0][:active], self._index[0][:active]
+        np.copyto(z, self._z0)
+        np.copyto(index, self._pixels)
+
+        for i in range(iterations):
+            np.multiply(z, z, out=z)
+            z += c
+            magnitude = self._magnitude[:active]
+            imag = self._imag[:active]
+            np.multiply(z.real, z.real, out=magnitude)
+            np.multiply(z.imag, z.imag, out=imag)
+            magnitude += imag
+            alive = np.less_equal(magnitude, 4.0, out=self._alive[:active])
+
+            # Compact the surviving pixels into the other buffer
+            active = np.count_nonzero(alive)
+            if active == 0:
+                break
+            target = (i + 1) % 2
+            z = np.compress(alive, z, out=self._z[target][:active])
+            index = np.compress(alive, index, out=self._index[target][:active])
+            counts[index] = i
+
+        return self._counts
+
+
+def frame_image(counts):
+    """Return the 8-bit grayscale image of a frame's escape counts, as shown by the demo."""
+    return np.rint(255 * (1.0 - (counts / max(counts.max(), 1)))).astype(np.uint8)
+
+
+def encode_png(image):
+    """Return the PNG bytes of an 8-bit grayscale image."""
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# Encoded frames in memory and on disk, each bounded by their total size
+frame_cache = ResultCache(maxsize=None, ttl=None, max_bytes=256 * 2**20)
+frame_disk_cache = DiskCache(
+    os.path.join(os.environ.get("FINOBI_CACHE_DIR", os.path.join(tempfile.gettempdir(), "finobi")), "julia"),
+    max_bytes=256 * 2**20,
+)
+
+
+# Renderers not in use, by (shape, scale). Renderers reuse their buffers, so
+# each one renders a single frame at a time; a few are kept for the next
+# frames instead of one per pool thread, as each holds tens of MiB.
+_idle_renderers = {}
+_idle_lock = threading.Lock()
+MAX_IDLE_RENDERERS = 8
+
+
+def _render_frame(key, shape, scale, c, iterations):
+    png = frame_cache.get(key)
+    if png is None:
+        png = frame_disk_cache.get(key)
+        if png is None:
+            renderer = _take_renderer(shape, scale)
+            try:
+                image = frame_image(renderer.render(c, iterations))
+            finally:
+                _return_renderer(renderer, shape, scale)
+            png = encode_png(image)
+            frame_disk_cache.put(key, png)
+        frame_cache.put(key, png)
+    return png
+
+
+def _take_renderer(shape, scale):
+    with _idle_lock:
+        idle = _idle_renderers.get((shape, scale))
+        if idle:
+            return idle.pop()
+    height, width = shape
+    return JuliaRenderer(width, height, scale)
+
+
+def _return_renderer(renderer, shape, scale):
+    with _idle_lock:
+        if sum(map(len, _idle_renderers.values())) < MAX_IDLE_RENDERERS:
+            _idle_renderers.setdefault((shape, scale), []).append(renderer)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor():
+    """Return the thread pool shared by every session in this server process."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, 8), thread_name_prefix="julia")
+        return _executor
+
+
+def render_frames(separation, iterations, frames=100, width=960, height=640, scale=400, prefetch=8):
+    """Yield the PNG images of the animation's frames in order, rendered ahead on the shared pool.
+
+    At most `prefetch` frames are queued or rendering at a time, so a slow
+    consumer holds back rendering instead of accumulating frames. Frames not
+    yet consumed are cancelled when the generator is closed.
+    """
+    executor = shared_executor()
+    angles = iter(enumerate(np.linspace(0.0, 4 * np.pi, frames)))
+    pending = deque()
+    try:
+        while True:
+            for frame, a in angles:
+                key = cache_key("julia", separation, iterations, frame, frames, width, height, scale)
+                pending.append(executor.submit(
+                    _render_frame, key, (height, width), scale, separation * np.exp(1j * a), iterations,
+                ))
+                if len(pending) >= prefetch:
+                    break
+            if not pending:
+                return
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
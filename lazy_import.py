@@ -0,0 +1,94 @@
+import ast
+import importlib
+import subprocess
+import sys
+import threading
+import time
+import types
+
+
+# Deferred imports for heavy dependencies.
+#
+# lazy_import returns a stand-in module that imports the real one the first
+# time an attribute is used, so a page only pays for libraries on the code
+# paths a user actually reaches. The time each first import took is kept in
+# import_times and exported with the page timings (see timing.py).
+#
+# Run `python lazy_import.py [page ...]` for a cold-start report: each page's
+# top-level imports run in a fresh interpreter under -X importtime and the
+# slowest modules are listed with their own and cumulative times.
+
+
+import_times = {}
+_import_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Module stand-in that imports `name` when one of its attributes is first used."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with _import_lock:
+                module = self.__dict__["_module"]
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    import_times[self.__name__] = time.perf_counter() - start
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """Return `name` if it is already imported, otherwise a LazyModule for it."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def _top_level_imports(path):
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read(), path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def import_report(path, limit=10):
+    """Return the slowest imports of a page and the imports that failed.
+
+    The slowest are [(module, self seconds, cumulative seconds)]. Imports run
+    in a new interpreter from the current directory, so every module is loaded
+    cold, as on a fresh server worker; one that fails does not stop the rest.
+    """
+    lines = ["import sys", "sys.path.insert(0, '')"]
+    for statement in _top_level_imports(path):
+        lines += ["try:", f"    {statement}", "except ImportError as error:", "    print(error)"]
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(lines)], capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((module.strip(), int(own) / 1e6, int(cumulative) / 1e6))
+    # Modules imported directly by the page carry their dependencies' time
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:limit], result.stdout.splitlines()
+
+
+if __name__ == "__main__":
+    for page in sys.argv[1:]:
+        print(page)
+        rows, errors = import_report(page)
+        for module, own, cumulative in rows:
+            print(f"  {cumulative * 1000:9.1f} ms cumulative {own * 1000:8.1f} ms self  {module}")
+        for error in errors:
+            print(f"  failed: {error}")
@@ -0,0 +1,78 @@
+import functools
+
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+
+# Server-side helpers for the map demo.
+#
+# hex_bins aggregates points into hexagons before they are sent, so the
+# browser receives one row per occupied hexagon instead of every point and
+# does no binning of its own. FrozenDeck lets a deck built once be shown on
+# every rerun without serializing its layer data again.
+
+
+# Default colour range of deck.gl's HexagonLayer, from few to many points
+HEX_COLORS = np.array([
+    [1, 152, 189],
+    [73, 227, 206],
+    [216, 254, 181],
+    [254, 237, 177],
+    [254, 173, 84],
+    [209, 55, 78],
+])
+
+# Metres per degree of latitude
+_METRES_PER_DEGREE = 111320.0
+
+
+def hex_bins(lon, lat, radius):
+    """Count points in pointy-top hexagons of circumradius `radius` metres.
+
+    Coordinates are projected onto a local equirectangular plane around their
+    mean, which is accurate at city scale. Returns a DataFrame with the lon
+    and lat of every occupied hexagon's centre, its point count, a colour on
+    HEX_COLORS and an elevation scaled to [0, 1000] like HexagonLayer's.
+    """
+    lon0, lat0 = np.mean(lon), np.mean(lat)
+    scale_x = _METRES_PER_DEGREE * np.cos(np.radians(lat0))
+    x = (np.asarray(lon) - lon0) * scale_x
+    y = (np.asarray(lat) - lat0) * _METRES_PER_DEGREE
+
+    # Fractional axial coordinates, rounded to the nearest hexagon in cube space
+    q = (np.sqrt(3) / 3 * x - y / 3) / radius
+    r = (2 / 3 * y) / radius
+    s = -q - r
+    rq, rr, rs = np.rint(q), np.rint(r), np.rint(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+
+    cells, counts = np.unique(np.stack([rq, rr], axis=1), axis=0, return_counts=True)
+    centre_x = radius * np.sqrt(3) * (cells[:, 0] + cells[:, 1] / 2)
+    centre_y = radius * 1.5 * cells[:, 1]
+    level = np.minimum(counts * len(HEX_COLORS) // (counts.max() + 1), len(HEX_COLORS) - 1)
+    return pd.DataFrame({
+        "lon": lon0 + centre_x / scale_x,
+        "lat": lat0 + centre_y / _METRES_PER_DEGREE,
+        "count": counts,
+        "color": HEX_COLORS[level].tolist(),
+        "elevation": 1000 * counts / counts.max(),
+    })
+
+
+class FrozenDeck(pdk.Deck):
+    """Deck whose JSON is built on first use and then reused.
+
+    For decks kept across reruns; the deck must not be changed once shown.
+    """
+
+    @functools.cached_property
+    def _json(self):
+        return super().to_json()
+
+    def to_json(self):
+        return self._json
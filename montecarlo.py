@@ -0,0 +1,278 @@
+import contextlib
+import functools
+import inspect
+import multiprocessing
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from projection import batch_balance, batch_cashflows
+from result_cache import ResultCache, cached
+from timing import span
+
+
+# Monte Carlo mode for the retirement projection.
+#
+# Return and inflation paths are drawn a chunk at a time and pushed through the
+# vectorized projection engine as one batch per chunk, with the per-year rates
+# passed as (paths x years) arrays. Each chunk is folded into a QuantileSketch
+# and a ruin counter and then dropped, so memory depends on the chunk size and
+# never on the total number of paths. Large runs are sharded across a process
+# pool; shards send back only their summaries, which merge by addition. Shards
+# are small (10000 paths), so a million-path run is 100 tasks and keeps every
+# core of a large machine busy.
+#
+# Seeded runs are deterministic, so their summaries are shared process-wide
+# through `simulation_cache`; a rerun with the same inputs, e.g. after an
+# unrelated widget changed, reuses the summary instead of simulating again.
+
+
+class QuantileSketch:
+    """Per-column quantile sketch with bounded relative error.
+
+    Values are counted in logarithmically sized buckets (as in DDSketch), so
+    any reported quantile is within `relative_accuracy` of the true value.
+    Values smaller in magnitude than `min_value` count as zero and values
+    beyond `max_value` are clamped. Sketches with the same settings merge by
+    adding their counts.
+    """
+
+    def __init__(self, columns, relative_accuracy=0.01, min_value=1.0, max_value=1e13):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(gamma)
+        self._buckets = int(np.ceil(np.log(max_value / min_value) / self._log_gamma))
+        # Buckets are laid out in value order: negatives (largest magnitude
+        # first), zero, then positives.
+        magnitudes = min_value * 2 * gamma ** np.arange(self._buckets + 1) / (gamma + 1)
+        self._values = np.concatenate([-magnitudes[::-1], [0.0], magnitudes])
+        self.counts = np.zeros((columns, len(self._values)), dtype=np.int64)
+
+    def add(self, values):
+        """Add a (samples x columns) array; masked entries are skipped."""
+        values = np.ma.asarray(values)
+        columns = np.broadcast_to(np.arange(self.counts.shape[0]), values.shape)
+        keep = ~np.ma.getmaskarray(values)
+        data = np.ma.getdata(values)[keep]
+        magnitude = np.abs(data)
+        index = np.ceil(np.log(np.maximum(magnitude, self.min_value) / self.min_value) / self._log_gamma)
+        index = np.minimum(index, self._buckets).astype(np.int64)
+        position = np.where(
+            magnitude < self.min_value,
+            self._buckets + 1,
+            self._buckets + 1 + np.sign(data).astype(np.int64) * (index + 1),
+        )
+        width = self.counts.shape[1]
+        flat = columns[keep] * width + position
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def merge(self, other):
+        """Fold another sketch with the same settings into this one."""
+        self.counts += other.counts
+        return self
+
+    def quantile(self, q):
+        """Return the q-quantile of every column (NaN for empty columns)."""
+        cumulative = np.cumsum(self.counts, axis=1)
+        total = cumulative[:, -1]
+        rank = q * (total - 1)
+        position = np.argmax(cumulative > rank[:, np.newaxis], axis=1)
+        return np.where(total > 0, self._values[position], np.nan)
+
+
+class SimulationSummary:
+    """Streaming summary of simulated balance paths: quantile bands and ruin counts."""
+
+    def __init__(self, years):
+        self.years = years
+        self.paths = 0
+        self.sketch = QuantileSketch(len(years))
+        self.ruined = np.zeros(len(years), dtype=np.int64)
+
+    def add(self, balance):
+        """Fold a (paths x years) chunk of balances into the summary."""
+        self.paths += balance.shape[0]
+        self.sketch.add(balance)
+        # A path is ruined from the first year its balance is exhausted
+        exhausted = np.ma.filled(balance <= 0, False)
+        self.ruined += np.logical_or.accumulate(exhausted, axis=1).sum(axis=0)
+
+    def merge(self, other):
+        self.paths += other.paths
+        self.sketch.merge(other.sketch)
+        self.ruined += other.ruined
+        return self
+
+    def bands(self, quantiles=(0.05, 0.5, 0.95)):
+        """Return {quantile: balance at each year}."""
+        return {q: self.sketch.quantile(q) for q in quantiles}
+
+    def ruin_probability(self):
+        """Return the probability of having run out of money by each year."""
+        return self.ruined / max(self.paths, 1)
+
+
+def simulate_balance_chunk(rng, paths, current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate,
+                           income_replacement_ratio, life_expectancy, roi_volatility, inflation_volatility):
+    """Simulate one chunk of balance paths with normally distributed yearly returns and inflation."""
+    shape = (paths, life_expectancy - current_age + 1)
+    # Keep yearly rates above -100% so balances never flip sign through growth
+    rois = np.maximum(rng.normal(roi, roi_volatility, shape), -99.0)
+    inflation_rates = np.maximum(rng.normal(inflation_rate, inflation_volatility, shape), -99.0)
+    _, balance = batch_balance(
+        current_age, super_bal, annual_contribution, retirement_age, rois, inflation_rates,
+        income_replacement_ratio, life_expectancy,
+    )
+    return balance
+
+
+def simulate_net_worth_chunk(rng, paths, current_age, retirement_age, initial_super_bal, initial_asset_balances,
+                             annual_super_contribution, annual_asset_contributions, initial_expenses,
+                             monthly_expenses, asset_rois, liability_roi, inflation_rate, life_expectancy,
+                             roi_volatility, inflation_volatility):
+    """Simulate one chunk of calculate_cashflows net worth paths.
+
+    Every asset class takes the same yearly market shock, scaled by
+    `roi_volatility`, on top of its expected return.
+    """
+    shape = (paths, life_expectancy - current_age + 1)
+    shock = rng.normal(0.0, roi_volatility, shape)
+    super_rois = np.maximum(asset_rois["Superannuation"] + shock, -99.0)
+    total_rois = np.maximum(sum(asset_rois.values()) + len(asset_rois) * shock, -99.0)
+    inflation_rates = np.maximum(rng.normal(inflation_rate, inflation_volatility, shape), -99.0)
+    _, _, _, _, net_worth = batch_cashflows(
+        current_age, retirement_age, initial_super_bal, sum(initial_asset_balances.values()),
+        annual_super_contribution, sum(annual_asset_contributions.values()), initial_expenses["Liabilities"],
+        monthly_expenses, super_rois, total_rois, liability_roi, inflation_rates, life_expectancy,
+    )
+    # Net worth is not reported for the starting year
+    net_worth[:, 0] = np.ma.masked
+    return net_worth
+
+
+def _simulate_shard(simulate_chunk, years, seed_sequence, paths, chunk_size, params):
+    rng = np.random.default_rng(seed_sequence)
+    summary = SimulationSummary(years)
+    for start in range(0, paths, chunk_size):
+        summary.add(simulate_chunk(rng, min(chunk_size, paths - start), **params))
+    return summary
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor():
+    """Return the process pool shared by every session in this server process."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers, since forking the multi-threaded server is unsafe
+            _executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+@contextlib.contextmanager
+def _plain_main():
+    # Spawned workers re-run the parent's __main__, which under Streamlit is
+    # the page script; with an empty one they only import what the shards need
+    with _executor_lock:
+        page, plain = sys.modules["__main__"], types.ModuleType("__main__")
+        sys.modules["__main__"] = plain
+        try:
+            yield
+        finally:
+            if sys.modules["__main__"] is plain:
+                sys.modules["__main__"] = page
+
+
+def simulate(simulate_chunk, years, paths, chunk_size=10000, shard_size=10000, seed=None, parallel=False, **params):
+    """Run `simulate_chunk` over `paths` paths and return the merged SimulationSummary.
+
+    Paths are split into shards of `shard_size`, each with its own RNG stream
+    spawned from `seed`. For a given (seed, shard_size) the result is the
+    same whether the shards run serially or in parallel, and on any number of
+    cores. With `parallel` the shards run on the shared process pool and only
+    their summaries are sent back.
+    """
+    shards = -(-paths // shard_size)
+    seed_sequences = np.random.SeedSequence(seed).spawn(shards)
+    sizes = [min(shard_size, paths - shard * shard_size) for shard in range(shards)]
+    arguments = (
+        repeat(simulate_chunk), repeat(years), seed_sequences, sizes, repeat(chunk_size), repeat(params),
+    )
+    if parallel and shards > 1:
+        executor = shared_executor()
+        # Workers are started as the shards are submitted
+        with _plain_main():
+            results = executor.map(_simulate_shard, *arguments)
+    else:
+        results = map(_simulate_shard, *arguments)
+
+    summary = SimulationSummary(years)
+    for result in results:
+        summary.merge(result)
+    return summary
+
+
+# A summary takes about 1.5 MB
+simulation_cache = ResultCache(maxsize=32, ttl=60 * 60)
+
+
+def cached_if_seeded(func):
+    """Share the results of calls with a seed through simulation_cache; unseeded calls always simulate."""
+    signature = inspect.signature(func)
+    shared = cached(simulation_cache)(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        seeded = signature.bind(*args, **kwargs).arguments.get("seed") is not None
+        return (shared if seeded else func)(*args, **kwargs)
+
+    return wrapper
+
+
+@span("simulation")
+@cached_if_seeded
+def simulate_balance(current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate,
+                     income_replacement_ratio, life_expectancy, roi_volatility=10, inflation_volatility=1,
+                     paths=10000, seed=None, parallel=False):
+    """Run a Monte Carlo version of calculate_balance and return a SimulationSummary.
+
+    Rates and volatilities are percentages, as on the sliders. Summaries of
+    seeded runs are shared and must not be modified.
+    """
+    return simulate(
+        simulate_balance_chunk, np.arange(current_age, life_expectancy + 1), paths, seed=seed, parallel=parallel,
+        current_age=current_age, super_bal=super_bal, annual_contribution=annual_contribution,
+        retirement_age=retirement_age, roi=roi, inflation_rate=inflation_rate,
+        income_replacement_ratio=income_replacement_ratio, life_expectancy=life_expectancy,
+        roi_volatility=roi_volatility, inflation_volatility=inflation_volatility,
+    )
+
+
+@span("simulation")
+@cached_if_seeded
+def simulate_cashflows(current_age, retirement_age, initial_super_bal, initial_asset_balances,
+                       annual_super_contribution, annual_asset_contributions, initial_expenses,
+                       monthly_expenses, asset_rois, liability_roi, inflation_rate, life_expectancy,
+                       roi_volatility=10, inflation_volatility=1, paths=10000, seed=None, parallel=False):
+    """Run a Monte Carlo version of calculate_cashflows and return a SimulationSummary of net worth.
+
+    Summaries of seeded runs are shared and must not be modified.
+    """
+    return simulate(
+        simulate_net_worth_chunk, np.arange(current_age, life_expectancy + 1), paths, seed=seed, parallel=parallel,
+        current_age=current_age, retirement_age=retirement_age, initial_super_bal=initial_super_bal,
+        initial_asset_balances=initial_asset_balances, annual_super_contribution=annual_super_contribution,
+        annual_asset_contributions=annual_asset_contributions, initial_expenses=initial_expenses,
+        monthly_expenses=monthly_expenses, asset_rois=asset_rois, liability_roi=liability_roi,
+        inflation_rate=inflation_rate, life_expectancy=life_expectancy, roi_volatility=roi_volatility,
+        inflation_volatility=inflation_volatility,
+    )
@@ -12,12 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any
-
-import numpy as np
-
 import streamlit as st
-from streamlit.hello.utils import show_code
+
+from julia import render_frames
+from timing import set_page, span
+from utils import show_code
 
 
 def animation_demo() -> None:
@@ -36,29 +35,19 @@ def animation_demo() -> None:
     frame_text = st.sidebar.empty()
     image = st.empty()
 
-    m, n, s = 960, 640, 400
-    x = np.linspace(-m / s, m / s, num=m).reshape((1, m))
-    y = np.linspace(-n / s, n / s, num=n).reshape((n, 1))
+    # Frames are rendered ahead on a shared thread pool and arrive in order
+    # as PNG bytes, so drawing one frame overlaps with computing the next
+    # ones. Frames already rendered for these slider values come from cache.
+    frames = render_frames(separation, iterations, frames=100)
 
-    for frame_num, a in enumerate(np.linspace(0.0, 4 * np.pi, 100)):
+    for frame_num, frame in enumerate(frames):
         # Here were setting value for these two elements.
         progress_bar.progress(frame_num)
         frame_text.text("Frame %i/100" % (frame_num + 1))
 
-        # Performing some fractal wizardry.
-        c = separation * np.exp(1j * a)
-        Z = np.tile(x, (n, 1)) + 1j * np.tile(y, (1, m))
-        C = np.full((n, m), c)
-        M: Any = np.full((n, m), True, dtype=bool)
-        N = np.zeros((n, m))
-
-        for i in range(iterations):
-            Z[M] = Z[M] * Z[M] + C[M]
-            M[np.abs(Z) > 2] = False
-            N[M] = i
-
         # Update the image placeholder by calling the image() function on it.
-        image.image(1.0 - (N / N.max()), use_column_width=True)
+        with span("image"):
+            image.image(frame, use_column_width=True)
 
     # We clear elements by calling empty on them.
     progress_bar.empty()
@@ -71,6 +60,7 @@ def animation_demo() -> None:
 
 
 st.set_page_config(page_title="Animation Demo", page_icon="📹")
+set_page(__file__)
 st.markdown("# Animation Demo")
 st.sidebar.header("Animation Demo")
 st.write(
@@ -1,19 +1,12 @@
 import altair as alt
-import numpy as np
 import pandas as pd
 import streamlit as st
 
+from projection import calculate_asset_liability_balances
+from timing import set_page, span
+
+set_page(__file__)
 
-# Function to calculate asset and liability balances at each year
-def calculate_asset_liability_balances(current_age, initial_assets, annual_contributions, annual_expenses, asset_roi, liability_roi, inflation_rate, life_expectancy):
-    years = np.arange(current_age, life_expectancy + 1)
-    asset_balance = np.zeros(len(years))
-    liability_balance = np.zeros(len(years))
-    asset_balance[0] = initial_assets
-    for i in range(1, len(years)):
-        asset_balance[i] = (asset_balance[i - 1] * (1 + asset_roi / 100) + annual_contributions) / (1 + inflation_rate / 100)
-        liability_balance[i] = liability_balance[i - 1] * (1 + liability_roi / 100) / (1 + inflation_rate / 100) + annual_expenses
-    return years, asset_balance, liability_balance
 
 # Streamlit app
 st.title("Asset Liability Cashflow Model")
@@ -28,7 +21,8 @@ inflation_rate = st.slider("Inflation rate", 0, 10, 2)
 life_expectancy = st.slider("Life expectancy", 80, 100, 85)
 
 years, asset_balance, liability_balance = calculate_asset_liability_balances(current_age, initial_assets, annual_contributions, annual_expenses, asset_roi, liability_roi, inflation_rate, life_expectancy)
-df = pd.DataFrame({"Year": years, "Asset Balance": asset_balance, "Liability Balance": liability_balance})
+with span("frame"):
+    df = pd.DataFrame({"Year": years, "Asset Balance": asset_balance, "Liability Balance": liability_balance})
 
 st.write("### Asset Liability Cashflow Model")
 
@@ -47,4 +41,5 @@ chart = alt.Chart(df).mark_bar().encode(
     height=400
 )
 
-st.altair_chart(chart, use_container_width=True)
+with span("render"):
+    st.altair_chart(chart, use_container_width=True)
@@ -17,23 +17,32 @@ import time
 import numpy as np
 
 import streamlit as st
-from streamlit.hello.utils import show_code
+
+from streaming import StreamingSeries
+from timing import set_page, span
+from utils import show_code
 
 
 def plotting_demo():
     progress_bar = st.sidebar.progress(0)
     status_text = st.sidebar.empty()
-    last_rows = np.random.randn(1, 1)
-    chart = st.line_chart(last_rows)
+    # Appended rows are buffered and sent to the chart at most 10 times a
+    # second. Without add_rows the chart is redrawn with the most recent 1000
+    # points each time.
+    chart = StreamingSeries(st.empty(), columns=1, window=1000, fps=10)
+    if not chart.incremental:
+        st.caption(f"The chart shows the most recent {chart.window} points.")
+    chart.append(np.random.randn(1, 1))
 
     for i in range(1, 101):
-        new_rows = last_rows[-1, :] + np.random.randn(5, 1).cumsum(axis=0)
+        new_rows = chart.last() + np.random.randn(5, 1).cumsum(axis=0)
         status_text.text("%i%% Complete" % i)
-        chart.add_rows(new_rows)
+        with span("append"):
+            chart.append(new_rows)
         progress_bar.progress(i)
-        last_rows = new_rows
         time.sleep(0.05)
 
+    chart.flush()
     progress_bar.empty()
 
     # Streamlit widgets automatically run the script from top to bottom. Since
@@ -43,6 +52,7 @@ def plotting_demo():
 
 
 st.set_page_config(page_title="Plotting Demo", page_icon="📈")
+set_page(__file__)
 st.markdown("# Plotting Demo")
 st.sidebar.header("Plotting Demo")
 st.write(
@@ -1,54 +1,10 @@
-import altair as alt
-import numpy as np
-import pandas as pd
 import streamlit as st
 
-# Function to calculate cashflows for each year
-def calculate_cashflows(current_age, retirement_age, initial_super_bal, initial_asset_balances, 
-                        annual_super_contribution, annual_asset_contributions, initial_expenses, 
-                        annual_expenses, monthly_expenses, asset_rois, liability_roi, inflation_rate, life_expectancy):
-    """Calculate cashflows for each year based on user inputs."""
-    years = np.arange(current_age, life_expectancy + 1)
-    super_balance = np.zeros(len(years))
-    total_assets = np.zeros(len(years))
-    liabilities = np.zeros(len(years))
-    net_worth = np.zeros(len(years))
-    
-    # Set initial balances
-    super_balance[0] = initial_super_bal
-    total_assets[0] = initial_super_bal + sum(initial_asset_balances.values())
-    liabilities[0] = initial_expenses["Liabilities"]  # Initial liabilities
-    
-    # Calculate monthly liabilities
-    monthly_liabilities = initial_expenses["Liabilities"] / 12
-    
-    for i in range(1, len(years)):
-        # Calculate super contributions and returns
-        if years[i] <= retirement_age:
-            super_contribution = annual_super_contribution
-        else:
-            super_contribution = 0
-        super_balance[i] = super_balance[i-1] * (1 + asset_rois["Superannuation"] / 100) + super_contribution
-        
-        # Calculate total asset contributions and returns
-        total_asset_contribution = sum(annual_asset_contributions.values())
-        total_assets[i] = total_assets[i-1] * (1 + sum(asset_rois.values()) / 100) + total_asset_contribution
-        
-        # Calculate monthly income and expenses
-        monthly_income = super_contribution / 12
-        monthly_expense = monthly_expenses * ((1 + inflation_rate / 100) ** (years[i] - current_age))
-        
-        # Calculate liabilities
-        liabilities[i] = liabilities[i-1] * (1 + liability_roi / 100) * (1 + inflation_rate / 100)
-        
-        # Calculate net worth
-        net_worth[i] = total_assets[i] - liabilities[i] + monthly_income - monthly_expense
-        
-        # Prevent negative liabilities
-        if liabilities[i] < 0:
-            liabilities[i] = 0
-        
-    return years, super_balance, total_assets, liabilities, net_worth
+from charts import cashflow_chart_spec, yearly_bar_chart_spec
+from projection import CASHFLOW_METRICS, calculate_cashflow_frame
+from timing import set_page, span
+
+set_page(__file__)
 
 # Streamlit app
 def main():
@@ -166,81 +122,20 @@ def main():
 
 
     # Calculate cashflows
-    years, super_balance, total_assets, liabilities, net_worth = calculate_cashflows(current_age, retirement_age, 
-                                                                                     initial_super_bal, initial_asset_balances, 
-                                                                                     annual_super_contribution, 
-                                                                                     annual_asset_contributions, 
-                                                                                     initial_expenses,
-                                                                                     annual_expenses, monthly_expenses, 
-                                                                                     asset_rois, liability_roi, 
-                                                                                     inflation_rate, life_expectancy)
-
-    # Create dataframe for visualization
-    df_super = pd.DataFrame({
-        "Year": years,
-        "Superannuation Balance": super_balance
-    })
-
-    df_assets = pd.DataFrame({
-        "Year": years,
-        "Total Assets": total_assets
-    })
-
-    df_liabilities = pd.DataFrame({
-        "Year": years,
-        "Liabilities": liabilities
-    })
-
-    df_net_worth = pd.DataFrame({
-        "Year": years,
-        "Net Worth": net_worth
-    })
-
-    # Plot charts
-    chart_super = alt.Chart(df_super).mark_bar().encode(
-        x='Year',
-        y=alt.Y('Superannuation Balance', axis=alt.Axis(title="Superannuation Balance ($)", format="$,.0f")),
-        tooltip=['Year', alt.Tooltip('Superannuation Balance', format='$,.0f')]
-    ).properties(
-        width=700,
-        height=200,
-        title="Superannuation Balance"
-    )
-
-    chart_assets = alt.Chart(df_assets).mark_bar().encode(
-        x='Year',
-        y=alt.Y('Total Assets', axis=alt.Axis(title="Total Assets ($)", format="$,.0f")),
-        tooltip=['Year', alt.Tooltip('Total Assets', format='$,.0f')]
-    ).properties(
-        width=700,
-        height=200,
-        title="Total Assets"
-    )
-
-    chart_liabilities = alt.Chart(df_liabilities).mark_bar().encode(
-        x='Year',
-        y=alt.Y('Liabilities', axis=alt.Axis(title="Liabilities ($)", format="$,.0f")),
-        tooltip=['Year', alt.Tooltip('Liabilities', format='$,.0f')]
-    ).properties(
-        width=700,
-        height=200,
-        title="Liabilities"
+    frame = calculate_cashflow_frame(
+        current_age, retirement_age, initial_super_bal, initial_asset_balances,
+        annual_super_contribution, annual_asset_contributions, initial_expenses,
+        annual_expenses, monthly_expenses, asset_rois,
+        liability_roi, inflation_rate, life_expectancy,
     )
 
-    chart_net_worth = alt.Chart(df_net_worth).mark_bar().encode(
-        x='Year',
-        y=alt.Y('Net Worth', axis=alt.Axis(title="Net Worth ($)", format="$,.0f")),
-        tooltip=['Year', alt.Tooltip('Net Worth', format='$,.0f')]
-    ).properties(
-        width=700,
-        height=200,
-        title="Net Worth"
-    )
-
-    st.altair_chart(chart_super)
-    st.altair_chart(chart_assets)
-    st.altair_chart(chart_liabilities)
-    st.altair_chart(chart_net_worth)
+    # Plot charts from the single (year x metric) frame
+    with span("charts"):
+        if st.checkbox("Show all metrics in one chart", True):
+            st.vega_lite_chart(cashflow_chart_spec(frame))
+        else:
+            for metric in CASHFLOW_METRICS:
+                st.vega_lite_chart(yearly_bar_chart_spec(frame["Year"].to_numpy(), frame[metric].to_numpy(), metric))
 
 # Run the app
 if __name__ == "__main__":
@@ -12,27 +12,68 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from urllib.error import URLError
-
-import pandas as pd
 import pydeck as pdk
 
 import streamlit as st
-from streamlit.hello.utils import show_code
+
+from datasets import DatasetUnavailableError, dataset_version, load_derived, load_records
+from maps import FrozenDeck, hex_bins
+from timing import set_page, span
+from utils import show_code
 
 
 def mapping_demo():
-    @st.cache_data
     def from_data_file(filename):
-        url = (
-            "https://raw.githubusercontent.com/streamlit/"
-            "example-data/master/hello/v1/%s" % filename
+        # Rows from the local dataset store, converted once per process and
+        # shared by every layer that uses the file
+        return load_records(filename.removesuffix(".json"))
+
+    def hex_bins_from_data_file(filename, radius):
+        # Points binned on the server, one row per occupied hexagon
+        def compute(table):
+            bins = hex_bins(table["lon"].to_numpy(), table["lat"].to_numpy(), radius)
+            return bins.to_dict(orient="records")
+
+        return load_derived(filename.removesuffix(".json"), ("hex_bins", radius), compute)
+
+    @st.cache_resource(max_entries=32)
+    def get_deck(layer_names, versions, _layers):
+        # One deck per layer selection and version of the data files, shared
+        # by all sessions, so the layer data is serialized only the first
+        # time it is shown
+        return FrozenDeck(
+            map_style=None,
+            initial_view_state={
+                "latitude": 37.76,
+                "longitude": -122.4,
+                "zoom": 11,
+                "pitch": 50,
+            },
+            layers=_layers,
         )
-        return pd.read_json(url)
 
     try:
-        ALL_LAYERS = {
-            "Bike Rentals": pdk.Layer(
+        # Read before the layer data, so a deck is never cached under a newer
+        # version than the data it holds
+        versions = tuple(
+            dataset_version(name) for name in ("bike_rental_stats", "bart_stop_stats", "bart_path_stats")
+        )
+        aggregate = st.sidebar.checkbox("Bin bike rentals on the server", False)
+        if aggregate:
+            bike_rentals = pdk.Layer(
+                "ColumnLayer",
+                data=hex_bins_from_data_file("bike_rental_stats.json", 200),
+                get_position=["lon", "lat"],
+                get_elevation="elevation",
+                get_fill_color="color",
+                radius=200,
+                disk_resolution=6,
+                angle=90,
+                elevation_scale=4,
+                extruded=True,
+            )
+        else:
+            bike_rentals = pdk.Layer(
                 "HexagonLayer",
                 data=from_data_file("bike_rental_stats.json"),
                 get_position=["lon", "lat"],
@@ -40,7 +81,9 @@ def mapping_demo():
                 elevation_scale=4,
                 elevation_range=[0, 1000],
                 extruded=True,
-            ),
+            )
+        ALL_LAYERS = {
+            "Bike Rentals": bike_rentals,
             "Bart Stop Exits": pdk.Layer(
                 "ScatterplotLayer",
                 data=from_data_file("bart_stop_stats.json"),
@@ -73,30 +116,21 @@ def mapping_demo():
             ),
         }
         st.sidebar.markdown("### Map Layers")
-        selected_layers = [
-            layer
-            for layer_name, layer in ALL_LAYERS.items()
+        selected_names = tuple(
+            layer_name
+            for layer_name in ALL_LAYERS
             if st.sidebar.checkbox(layer_name, True)
-        ]
-        if selected_layers:
-            st.pydeck_chart(
-                pdk.Deck(
-                    map_style=None,
-                    initial_view_state={
-                        "latitude": 37.76,
-                        "longitude": -122.4,
-                        "zoom": 11,
-                        "pitch": 50,
-                    },
-                    layers=selected_layers,
-                )
-            )
+        )
+        if selected_names:
+            selected_layers = [ALL_LAYERS[layer_name] for layer_name in selected_names]
+            with span("render"):
+                st.pydeck_chart(get_deck((selected_names, aggregate), versions, selected_layers))
         else:
             st.error("Please choose at least one layer above.")
-    except URLError as e:
+    except DatasetUnavailableError as e:
         st.error(
             """
-            **This demo requires internet access.**
+            **This demo requires internet access or a local copy of its data.**
             Connection error: %s
         """
             % e.reason
@@ -104,6 +138,7 @@ def mapping_demo():
 
 
 st.set_page_config(page_title="Mapping Demo", page_icon="🌍")
+set_page(__file__)
 st.markdown("# Mapping Demo")
 st.sidebar.header("Mapping Demo")
 st.write(
@@ -12,38 +12,48 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from urllib.error import URLError
-
 import altair as alt
+import numpy as np
 import pandas as pd
 
 import streamlit as st
-from streamlit.hello.utils import show_code
+
+from datasets import DatasetUnavailableError, load_derived
+from timing import set_page, span
+from utils import show_code
 
 
 def data_frame_demo():
-    @st.cache_data
     def get_UN_data():
-        AWS_BUCKET_URL = "https://streamlit-demo-data.s3-us-west-2.amazonaws.com"
-        df = pd.read_csv(AWS_BUCKET_URL + "/agri.csv.gz")
-        return df.set_index("Region")
+        # Read from the local dataset store and reshape once per process:
+        # the table in $B by region, and the same values in long format with
+        # each region's years in one contiguous block of rows
+        def compute(table):
+            df = table.to_pandas().set_index("Region") / 1000000.0
+            years = len(df.columns)
+            long = pd.DataFrame({
+                "year": np.tile(df.columns.to_numpy(), len(df)),
+                "Region": np.repeat(df.index.to_numpy(), years),
+                "Gross Agricultural Product ($B)": df.to_numpy().ravel(),
+            })
+            return list(df.index), df, long, years
+
+        return load_derived("agri", "by_region", compute)
 
     try:
-        df = get_UN_data()
+        regions, df, long, years = get_UN_data()
         countries = st.multiselect(
-            "Choose countries", list(df.index), ["China", "United States of America"]
+            "Choose countries", regions, ["China", "United States of America"]
         )
         if not countries:
             st.error("Please select at least one country.")
         else:
-            data = df.loc[countries]
-            data /= 1000000.0
+            positions = df.index.get_indexer(countries)
+            data = df.iloc[positions]
             st.write("### Gross Agricultural Production ($B)", data.sort_index())
 
-            data = data.T.reset_index()
-            data = pd.melt(data, id_vars=["index"]).rename(
-                columns={"index": "year", "value": "Gross Agricultural Product ($B)"}
-            )
+            rows = (positions[:, np.newaxis] * years + np.arange(years)).ravel()
+            data = long.iloc[rows]
             chart = (
                 alt.Chart(data)
                 .mark_area(opacity=0.3)
@@ -53,11 +63,12 @@ def data_frame_demo():
                     color="Region:N",
                 )
             )
-            st.altair_chart(chart, use_container_width=True)
-    except URLError as e:
+            with span("render"):
+                st.altair_chart(chart, use_container_width=True)
+    except DatasetUnavailableError as e:
         st.error(
             """
-            **This demo requires internet access.**
+            **This demo requires internet access or a local copy of its data.**
             Connection error: %s
         """
             % e.reason
@@ -65,6 +76,7 @@ def data_frame_demo():
 
 
 st.set_page_config(page_title="DataFrame Demo", page_icon="📊")
+set_page(__file__)
 st.markdown("# DataFrame Demo")
 st.sidebar.header("DataFrame Demo")
 st.write(
@@ -1,6 +1,4 @@
-from openai import OpenAI
 import streamlit as st
-import streamlit_authenticator as stauth
 import os
 
 
@@ -11,18 +9,13 @@ from pydantic import BaseModel, Field, ValidationError, parse_obj_as
 
 import streamlit_pydantic as sp
 
+from auth import get_authenticator
+from chat import ChatHistory, response_cache
 
 
-with open("./config.yaml","r") as file:
-    config = yaml.load(file, Loader=SafeLoader)
 
-authenticator = stauth.Authenticate(
-    config['credentials'],
-    config['cookie']['name'],
-    config['cookie']['key'],
-    config['cookie']['expiry_days'],
-    config['pre-authorized']
-)
+# Credentials are loaded and hashed once per process, not on every rerun
+authenticator = get_authenticator("./config.yaml")
 
 
 authenticator.login()
@@ -30,13 +23,19 @@ authenticator.login()
 
 with st.sidebar:
     openai_api_key = st.text_input("OpenAI API Key", key="chatbot_api_key", type="password")
+    st.caption(f"Replies answered from cache: {response_cache.stats()['hit_rate']:.0%}")
     
 st.title("💬 Chatbot")
 st.caption("🚀 A streamlit chatbot powered by OpenAI LLM")
-if "messages" not in st.session_state:
-    st.session_state["messages"] = [{"role": "assistant", "content": "How can I help you?"}]
-
-for msg in st.session_state.messages:
+if "chat_history" not in st.session_state:
+    st.session_state["chat_history"] = ChatHistory(budget=3000)
+    st.session_state["chat_history"].append("assistant", "How can I help you?")
+history = st.session_state["chat_history"]
+
+# Earlier turns are only kept as the summary sent with each prompt
+if history.compacted:
+    st.caption(f"{history.compacted} earlier messages summarized")
+for msg in history.messages[-20:]:
     st.chat_message(msg["role"]).write(msg["content"])
 
 if prompt := st.chat_input():
@@ -44,13 +43,13 @@ if prompt := st.chat_input():
         st.info("Please add your OpenAI API key to continue.")
         st.stop()
 
-    client = OpenAI(api_key=openai_api_key)
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    history.append("user", prompt)
     st.chat_message("user").write(prompt)
-    response = client.chat.completions.create(model="gpt-3.5-turbo", messages=st.session_state.messages)
-    msg = response.choices[0].message.content
-    st.session_state.messages.append({"role": "assistant", "content": msg})
-    st.chat_message("assistant").write(msg)
+    # Show the reply token by token as it streams in, or at once if another
+    # session already asked the same question
+    with st.chat_message("assistant"):
+        msg = st.write_stream(response_cache.stream(openai_api_key, "gpt-3.5-turbo", history.context()))
+    history.append("assistant", msg)
 
 
 st.title(os.getcwd())
@@ -0,0 +1,433 @@
+import numpy as np
+
+from lazy_import import lazy_import
+from result_cache import ResultCache, cached
+from timing import span
+
+pd = lazy_import("pandas")
+
+
+# Shared projection engine for the cashflow pages.
+#
+# Every model on the pages is a first-order linear recurrence of the form
+#     x[i] = factor[i] * x[i-1] + inflow[i]
+# which unrolls to
+#     x[i] = G[i] * (x[0] + sum_{j<=i} inflow[j] / G[j]),  G[i] = prod_{j<=i} factor[j]
+# so each series is one cumulative product and one cumulative sum instead of
+# a Python loop over the years. Factors must be positive (rates above -100%).
+#
+# The batch_* functions take one value per scenario (1-D arrays, or scalars
+# that broadcast) and return (scenarios x years) masked arrays on a shared age
+# axis. Rows with a later current age or an earlier life expectancy are masked
+# outside their own horizon, so scenarios with different ages still run in a
+# single vectorized pass. Rates may also be given as (scenarios x years) arrays
+# of per-year rates on that shared axis. The calculate_* functions used by the
+# pages are the single-scenario case; their results are cached process-wide
+# in `projection_cache`, so reruns and other sessions with the same inputs
+# skip the calculation.
+
+
+projection_cache = ResultCache(maxsize=4096, ttl=60 * 60)
+
+# Time steps supported by calculate_periodic_cashflows
+PERIODS_PER_YEAR = {"annual": 1, "monthly": 12, "weekly": 52}
+
+# Series returned by calculate_cashflows, in order, as named on the charts
+CASHFLOW_METRICS = ("Superannuation Balance", "Total Assets", "Liabilities", "Net Worth")
+
+
+def _scenario(value):
+    """Shape a per-scenario input as a column against the age axis."""
+    return np.asarray(value, dtype=float)[..., np.newaxis]
+
+
+def _rate(value):
+    """Shape a rate as a column, or keep it as given if it is already per year."""
+    value = np.asarray(value, dtype=float)
+    return value if value.ndim == 2 else value[..., np.newaxis]
+
+
+def _horizon(current_age, life_expectancy):
+    """Return the shared age axis, each row's elapsed years and its out-of-horizon mask."""
+    current_age = np.asarray(current_age)[..., np.newaxis]
+    life_expectancy = np.asarray(life_expectancy)[..., np.newaxis]
+    years = np.arange(current_age.min(), life_expectancy.max() + 1)
+    elapsed = years - current_age
+    outside = (elapsed < 0) | (years > life_expectancy)
+    return years, elapsed, outside
+
+
+def _linear_recurrence(x0, factor, inflow, elapsed):
+    """Evaluate x[i] = factor[i] * x[i-1] + inflow[i] along the last axis.
+
+    Until a row's first projected year (`elapsed` <= 0) it holds `x0`, so rows
+    that start later on the shared age axis wait at their initial value.
+    """
+    started = elapsed > 0
+    factor = np.where(started, factor, 1.0)
+    inflow = np.where(started, inflow, 0.0)
+    growth = np.cumprod(factor, axis=-1)
+    return growth * (x0 + np.cumsum(inflow / growth, axis=-1))
+
+
+def _masked(values, outside):
+    return np.ma.masked_array(values, mask=np.broadcast_to(outside, np.shape(values)).copy())
+
+
+def batch_cashflows(current_age, retirement_age, initial_super_bal, initial_assets,
+                    annual_super_contribution, annual_asset_contribution, initial_liabilities,
+                    monthly_expenses, super_roi, total_assets_roi, liability_roi, inflation_rate, life_expectancy):
+    """Calculate cashflows for many scenarios at once.
+
+    `initial_assets` and `annual_asset_contribution` are the totals outside
+    super; `total_assets_roi` is the combined return applied to all assets.
+    """
+    years, elapsed, outside = _horizon(current_age, life_expectancy)
+    inflation = 1 + _rate(inflation_rate) / 100
+    initial_super_bal = _scenario(initial_super_bal)
+
+    # Super contributions stop after retirement
+    super_contribution = np.where(years <= _scenario(retirement_age), _scenario(annual_super_contribution), 0.0)
+    super_balance = _linear_recurrence(
+        initial_super_bal, 1 + _rate(super_roi) / 100, super_contribution, elapsed
+    )
+
+    # Total assets grow at the combined rate with a fixed annual contribution
+    total_assets = _linear_recurrence(
+        initial_super_bal + _scenario(initial_assets),
+        1 + _rate(total_assets_roi) / 100,
+        _scenario(annual_asset_contribution),
+        elapsed,
+    )
+
+    # Liabilities compound at the liability rate plus inflation, never below zero
+    liabilities = _linear_recurrence(
+        _scenario(initial_liabilities), (1 + _rate(liability_roi) / 100) * inflation, 0.0, elapsed
+    )
+    liabilities = np.where(elapsed > 0, np.maximum(liabilities, 0), liabilities)
+
+    # Net worth is only reported from the first projected year onwards
+    monthly_income = super_contribution / 12
+    monthly_expense = _linear_recurrence(_scenario(monthly_expenses), inflation, 0.0, elapsed)
+    net_worth = total_assets - liabilities + monthly_income - monthly_expense
+    net_worth = np.where(elapsed > 0, net_worth, 0.0)
+
+    return (
+        years,
+        _masked(super_balance, outside),
+        _masked(total_assets, outside),
+        _masked(liabilities, outside),
+        _masked(net_worth, outside),
+    )
+
+
+@span("projection")
+@cached(projection_cache)
+def calculate_cashflows(current_age, retirement_age, initial_super_bal, initial_asset_balances,
+                        annual_super_contribution, annual_asset_contributions, initial_expenses,
+                        annual_expenses, monthly_expenses, asset_rois, liability_roi, inflation_rate, life_expectancy):
+    """Calculate cashflows for each year based on user inputs."""
+    years, *series = batch_cashflows(
+        current_age, retirement_age, initial_super_bal, sum(initial_asset_balances.values()),
+        annual_super_contribution, sum(annual_asset_contributions.values()), initial_expenses["Liabilities"],
+        monthly_expenses, asset_rois["Superannuation"], sum(asset_rois.values()), liability_roi,
+        inflation_rate, life_expectancy,
+    )
+    return (years, *(np.ma.getdata(values) for values in series))
+
+
+@span("frame")
+def cashflow_frame(years, *series):
+    """Return one frame with a Year column and a column per CASHFLOW_METRICS series."""
+    return pd.DataFrame({"Year": years, **dict(zip(CASHFLOW_METRICS, series))})
+
+
+def calculate_cashflow_frame(current_age, retirement_age, initial_super_bal, initial_asset_balances,
+                             annual_super_contribution, annual_asset_contributions, initial_expenses,
+                             annual_expenses, monthly_expenses, asset_rois, liability_roi, inflation_rate, life_expectancy):
+    """Calculate cashflows as a single (year x metric) frame."""
+    return cashflow_frame(*calculate_cashflows(
+        current_age, retirement_age, initial_super_bal, initial_asset_balances, annual_super_contribution,
+        annual_asset_contributions, initial_expenses, annual_expenses, monthly_expenses, asset_rois,
+        liability_roi, inflation_rate, life_expectancy,
+    ))
+
+
+@span("projection")
+@cached(projection_cache)
+def calculate_periodic_cashflows(current_age, retirement_age, initial_super_bal, initial_asset_balances,
+                                 annual_super_contribution, annual_asset_contributions, initial_expenses,
+                                 annual_expenses, monthly_expenses, asset_rois, liability_roi, inflation_rate,
+                                 life_expectancy, frequency="monthly"):
+    """Calculate cashflows at monthly or weekly steps instead of yearly ones.
+
+    Annual contributions are paid in equal parts every period and rates are
+    converted to the equivalent per-period rate, so a year of steps compounds
+    to the annual rate. Returns the age at every step and the same series as
+    calculate_cashflows; "annual" reproduces calculate_cashflows exactly.
+    Use to_annual to reduce the series for display.
+    """
+    periods = PERIODS_PER_YEAR[frequency]
+    steps = np.arange((life_expectancy - current_age) * periods + 1)
+    ages = current_age + steps / periods
+
+    def per_period(rate):
+        return (1 + rate / 100) ** (1 / periods)
+
+    inflation = per_period(inflation_rate)
+    working = steps <= (retirement_age - current_age) * periods
+
+    super_balance = _linear_recurrence(
+        initial_super_bal, per_period(asset_rois["Superannuation"]),
+        np.where(working, annual_super_contribution / periods, 0.0), steps,
+    )
+    total_assets = _linear_recurrence(
+        initial_super_bal + sum(initial_asset_balances.values()), per_period(sum(asset_rois.values())),
+        sum(annual_asset_contributions.values()) / periods, steps,
+    )
+
+    # Liabilities compound at the liability rate plus inflation, never below zero
+    liabilities = initial_expenses["Liabilities"] * (per_period(liability_roi) * inflation) ** steps
+    liabilities[1:] = np.maximum(liabilities[1:], 0)
+
+    # Net worth is only reported from the first step onwards
+    monthly_income = np.where(working, annual_super_contribution / 12, 0.0)
+    monthly_expense = monthly_expenses * inflation ** steps
+    net_worth = total_assets - liabilities + monthly_income - monthly_expense
+    net_worth[0] = 0.0
+
+    return ages, super_balance, total_assets, liabilities, net_worth
+
+
+def to_annual(values, frequency, how="last"):
+    """Reduce a calculate_periodic_cashflows series to one value per year.
+
+    Balances take the value at the end of each year (`how="last"`); flows can
+    be summed or averaged over the year's steps instead. The first value is
+    the starting point and is kept as is.
+    """
+    periods = PERIODS_PER_YEAR[frequency]
+    if how == "last":
+        return values[::periods]
+    years = values[1:].reshape(-1, periods)
+    reduced = years.sum(axis=1) if how == "sum" else years.mean(axis=1)
+    return np.concatenate([values[:1], reduced])
+
+
+class CashflowProjection:
+    """calculate_cashflows kept up to date incrementally, for one session.
+
+    Each series records the inputs it depends on. An update recomputes only
+    the series whose inputs changed, and only from the first year the change
+    can affect. Moving the retirement age recomputes super from the earlier of
+    the two ages, a longer life expectancy only appends years, and a shorter
+    one truncates. `recomputed` counts the values each series calculated in
+    the last update.
+    """
+
+    # Inputs that change a recurrence over its whole horizon
+    DEPENDENCIES = {
+        "super_balance": ("initial_super_bal", "super_roi", "annual_super_contribution"),
+        "total_assets": ("initial_super_bal", "initial_assets", "total_assets_roi", "annual_asset_contribution"),
+        "liabilities": ("initial_liabilities", "liability_roi", "inflation_rate"),
+        "monthly_expense": ("monthly_expenses", "inflation_rate"),
+        "super_contribution": ("annual_super_contribution",),
+    }
+
+    def __init__(self):
+        self.params = None
+        self.years = None
+        self.series = {}
+        self.recomputed = {}
+
+    @span("projection")
+    def update(self, current_age, retirement_age, initial_super_bal, initial_asset_balances,
+               annual_super_contribution, annual_asset_contributions, initial_expenses,
+               annual_expenses, monthly_expenses, asset_rois, liability_roi, inflation_rate, life_expectancy):
+        """Return what calculate_cashflows returns for these inputs."""
+        params = {
+            "current_age": current_age,
+            "retirement_age": retirement_age,
+            "initial_super_bal": initial_super_bal,
+            "initial_assets": sum(initial_asset_balances.values()),
+            "annual_super_contribution": annual_super_contribution,
+            "annual_asset_contribution": sum(annual_asset_contributions.values()),
+            "initial_liabilities": initial_expenses["Liabilities"],
+            "monthly_expenses": monthly_expenses,
+            "super_roi": asset_rois["Superannuation"],
+            "total_assets_roi": sum(asset_rois.values()),
+            "liability_roi": liability_roi,
+            "inflation_rate": inflation_rate,
+            "life_expectancy": life_expectancy,
+        }
+        years = np.arange(current_age, life_expectancy + 1)
+        starts = self._starts(params, len(years))
+        self.params = params
+        self.years = years
+        inflation = 1 + inflation_rate / 100
+
+        series = self.series
+
+        # Super contributions stop after retirement
+        self._update_series(
+            "super_contribution", starts,
+            lambda part: np.where(years[part] <= retirement_age, annual_super_contribution, 0.0),
+        )
+        self._update_recurrence(
+            "super_balance", starts, initial_super_bal, 1 + params["super_roi"] / 100, series["super_contribution"]
+        )
+        self._update_recurrence(
+            "total_assets", starts, initial_super_bal + params["initial_assets"],
+            1 + params["total_assets_roi"] / 100, np.full(len(years), params["annual_asset_contribution"]),
+        )
+        self._update_recurrence(
+            "liabilities", starts, params["initial_liabilities"], (1 + liability_roi / 100) * inflation,
+            np.zeros(len(years)),
+        )
+        # Liabilities never go below zero
+        liabilities = series["liabilities"]
+        tail = max(starts["liabilities"], 1)
+        liabilities[tail:] = np.maximum(liabilities[tail:], 0)
+        self._update_recurrence("monthly_expense", starts, monthly_expenses, inflation, np.zeros(len(years)))
+
+        # Net worth is elementwise, so it is recomputed from the earliest change
+        # in any of its inputs; it is only reported from the first projected year
+        self._update_series(
+            "net_worth", starts,
+            lambda part: (
+                series["total_assets"][part] - series["liabilities"][part]
+                + series["super_contribution"][part] / 12 - series["monthly_expense"][part]
+            ),
+        )
+        if starts["net_worth"] == 0:
+            series["net_worth"][0] = 0.0
+
+        return years, series["super_balance"], series["total_assets"], series["liabilities"], series["net_worth"]
+
+    def _starts(self, params, periods):
+        """Return the first index each series has to recompute."""
+        names = list(self.DEPENDENCIES) + ["net_worth"]
+        old = self.params
+        if old is None or params["current_age"] != old["current_age"]:
+            return dict.fromkeys(names, 0)
+
+        # Years beyond the previous horizon are always new
+        horizon = min(periods, old["life_expectancy"] - old["current_age"] + 1)
+        starts = {
+            name: 0 if any(params[d] != old[d] for d in dependencies) else horizon
+            for name, dependencies in self.DEPENDENCIES.items()
+        }
+        # Contributions only differ after the earlier of the two retirement ages
+        if params["retirement_age"] != old["retirement_age"]:
+            first = min(params["retirement_age"], old["retirement_age"]) + 1 - params["current_age"]
+            first = min(max(first, 1), horizon)
+            starts["super_contribution"] = min(starts["super_contribution"], first)
+            starts["super_balance"] = min(starts["super_balance"], first)
+        starts["net_worth"] = min(
+            starts[name] for name in ("total_assets", "liabilities", "super_contribution", "monthly_expense")
+        )
+        return starts
+
+    def _update_series(self, name, starts, compute):
+        # `compute` returns the values of an elementwise series for a slice of years
+        start = starts[name]
+        periods = len(self.years)
+        fresh = compute(slice(start, periods))
+        if start > 0:
+            fresh = np.concatenate([self.series[name][:start], fresh])
+        self.series[name] = fresh
+        self.recomputed[name] = periods - start
+
+    def _update_recurrence(self, name, starts, x0, factor, inflow):
+        start = starts[name]
+        old = self.series.get(name)
+        periods = len(inflow)
+        if start == 0:
+            values = _linear_recurrence(x0, factor, inflow, np.arange(periods))
+        else:
+            # Continue the recurrence from the last value that is still valid
+            tail = _linear_recurrence(old[start - 1], factor, inflow[start - 1:], np.arange(periods - start + 1))
+            values = np.concatenate([old[:start], tail[1:]])
+        self.series[name] = values
+        self.recomputed[name] = periods - start
+
+
+@span("projection")
+@cached(projection_cache)
+def calculate_drawdown_cashflows(current_age, retirement_age, initial_super_bal, initial_asset_balances,
+                                 annual_super_contribution, annual_assets_roi, initial_liabilities,
+                                 annual_expenses, inflation_rate, life_expectancy):
+    """Calculate cashflows where expenses are drawn from assets and any shortfall becomes a liability."""
+    years, elapsed, _ = _horizon(current_age, life_expectancy)
+    growth = 1 + annual_assets_roi / 100
+    inflation = 1 + inflation_rate / 100
+
+    super_contribution = np.where(years <= retirement_age, annual_super_contribution, 0.0)
+    super_balance = _linear_recurrence(initial_super_bal, growth, super_contribution, elapsed)
+
+    # Assets follow the unclamped drawdown path until it first goes negative.
+    # From then on they stay at zero and each year's expenses are a shortfall.
+    expense = annual_expenses * inflation
+    unclamped = _linear_recurrence(
+        initial_super_bal + sum(initial_asset_balances.values()), growth, -expense, elapsed
+    )
+    depleted = np.cumsum((unclamped < 0) & (elapsed > 0)) > 0
+    first_shortfall = np.diff(depleted, prepend=False)
+    shortfall = np.where(first_shortfall, unclamped, np.where(depleted, -expense, 0.0))
+    total_assets = np.where(depleted, 0.0, unclamped)
+
+    total_liabilities = _linear_recurrence(sum(initial_liabilities.values()), inflation, shortfall, elapsed)
+
+    net_cash = super_balance + total_assets - total_liabilities
+    net_cash[0] = 0.0
+
+    return years, super_balance, total_assets, total_liabilities, net_cash
+
+
+def batch_balance(current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate, income_replacement_ratio, life_expectancy):
+    """Calculate the real super balance for many scenarios at once."""
+    years, elapsed, outside = _horizon(current_age, life_expectancy)
+    super_bal = _scenario(super_bal)
+    inflation = 1 + _rate(inflation_rate) / 100
+    annual_expenses = super_bal * (_scenario(income_replacement_ratio) / 100)
+    drawdown = np.where(years >= _scenario(retirement_age), annual_expenses, 0.0)
+    balance = _linear_recurrence(
+        super_bal, (1 + _rate(roi) / 100) / inflation, _scenario(annual_contribution) / inflation - drawdown, elapsed
+    )
+    return years, _masked(balance, outside)
+
+
+@span("projection")
+@cached(projection_cache)
+def calculate_balance(current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate, income_replacement_ratio, life_expectancy):
+    """Calculate the real super balance at each year, drawing expenses from retirement."""
+    years, balance = batch_balance(
+        current_age, super_bal, annual_contribution, retirement_age, roi, inflation_rate,
+        income_replacement_ratio, life_expectancy,
+    )
+    return years, np.ma.getdata(balance)
+
+
+def batch_asset_liability_balances(current_age, initial_assets, annual_contributions, annual_expenses, asset_roi, liability_roi, inflation_rate, life_expectancy):
+    """Calculate real asset and liability balances for many scenarios at once."""
+    years, elapsed, outside = _horizon(current_age, life_expectancy)
+    inflation = 1 + _rate(inflation_rate) / 100
+    asset_balance = _linear_recurrence(
+        _scenario(initial_assets), (1 + _rate(asset_roi) / 100) / inflation,
+        _scenario(annual_contributions) / inflation, elapsed,
+    )
+    liability_balance = _linear_recurrence(
+        0.0, (1 + _rate(liability_roi) / 100) / inflation, _scenario(annual_expenses), elapsed
+    )
+    return years, _masked(asset_balance, outside), _masked(liability_balance, outside)
+
+
+@span("projection")
+@cached(projection_cache)
+def calculate_asset_liability_balances(current_age, initial_assets, annual_contributions, annual_expenses, asset_roi, liability_roi, inflation_rate, life_expectancy):
+    """Calculate real asset and liability balances at each year."""
+    years, asset_balance, liability_balance = batch_asset_liability_balances(
+        current_age, initial_assets, annual_contributions, annual_expenses, asset_roi, liability_roi,
+        inflation_rate, life_expectancy,
+    )
+    return years, np.ma.getdata(asset_balance), np.ma.getdata(liability_balance)
@@ -0,0 +1,245 @@
+import functools
+import hashlib
+import inspect
+import numbers
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Process-wide result cache for the calculation functions.
+#
+# Entries are keyed on a digest of the function and its normalized arguments,
+# so the same inputs from any session hit the same entry. Dict arguments (such
+# as asset_rois) are keyed independently of their insertion order and numbers
+# independently of their type, so 4 and 4.0 share an entry. Cached arrays are
+# made read-only because every caller receives the same objects. A
+# ResultCache can also be bounded by the total size of its values, for
+# caches of encoded results whose size varies.
+#
+# DiskCache keeps encoded results (bytes) in a directory so they survive
+# restarts and are shared by every server process on the machine.
+
+
+def _canonical(value):
+    """Reduce a value to plain tuples, strings, floats and bytes for hashing."""
+    if isinstance(value, dict):
+        items = ((_canonical(k), _canonical(v)) for k, v in value.items())
+        return ("dict", tuple(sorted(items, key=repr)))
+    if isinstance(value, (list, tuple)):
+        return ("seq", tuple(_canonical(v) for v in value))
+    # A DataFrame can only exist once pandas is imported, so it is not imported here
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(value, pd.DataFrame):
+        columns = tuple((str(name), _canonical(column.to_numpy())) for name, column in value.items())
+        return ("frame", columns)
+    if np.ma.isMaskedArray(value):
+        return ("masked", _canonical(np.ma.getdata(value)), _canonical(np.ma.getmaskarray(value)))
+    if isinstance(value, np.ndarray) and value.dtype == object:
+        return ("objects", value.shape, tuple(_canonical(v) for v in value.ravel()))
+    if isinstance(value, np.ndarray):
+        return ("array", value.dtype.str, value.shape, np.ascontiguousarray(value).tobytes())
+    if isinstance(value, (bool, np.bool_)):
+        return ("bool", bool(value))
+    if isinstance(value, numbers.Real):
+        return float(value)
+    if value is None or isinstance(value, (str, bytes)):
+        return value
+    raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+
+
+def cache_key(*parts):
+    """Return the hex digest identifying `parts`."""
+    return hashlib.blake2b(repr(_canonical(parts)).encode(), digest_size=20).hexdigest()
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+class ResultCache:
+    """Thread-safe LRU cache with an optional time-to-live and usage counters.
+
+    With `max_bytes`, the least recently used entries are also evicted while
+    the values' total `sizeof` (len, by default for bytes) exceeds it; a
+    value larger than `max_bytes` is not stored. `maxsize` may then be None.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, max_bytes=None, sizeof=len):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored, value, size = entry
+                if self.ttl is None or time.monotonic() - stored < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (time.monotonic(), value, size)
+            self._bytes += size
+            while ((self.maxsize is not None and len(self._entries) > self.maxsize)
+                   or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return the counters used to size the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_missing = object()
+
+
+def cached(cache):
+    """Decorate a pure function so its results are shared through `cache`."""
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = cache_key(name, bound.arguments)
+            result = cache.get(key, _missing)
+            if result is _missing:
+                result = _freeze(func(*args, **kwargs))
+                cache.put(key, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+class DiskCache:
+    """Byte values stored as files named by key, bounded by their total size.
+
+    Writes go through a temporary file and an atomic rename, so concurrent
+    processes never read a partial entry. The total size is counted as
+    entries are written; when it grows beyond `max_bytes` the directory is
+    scanned and the least recently read or written entries are deleted until
+    it is back under three quarters of `max_bytes`. Each process counts only
+    its own writes between scans, so with several processes the directory
+    may briefly exceed `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # Total size as of the last scan plus this process's writes since;
+        # None until the first write scans the directory
+        self._bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key, default=None):
+        try:
+            with open(self._path(key), "rb") as f:
+                value = f.read()
+        except FileNotFoundError:
+            return default
+        # Mark the entry as recently used for eviction
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(temporary, path)
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += len(value) - replaced
+            if self._bytes is None or self._bytes > self.max_bytes:
+                self._bytes = self._evict(self.max_bytes if self._bytes is None else self.max_bytes * 3 // 4)
+
+    def _evict(self, target):
+        """Delete the least recently used entries until at most `target` bytes remain; return the total left."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
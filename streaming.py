@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# Live line chart for streamed values.
+#
+# Rows are written into a fixed-capacity ring buffer as they arrive and the
+# chart is updated from the buffer at most `fps` times a second, so a fast
+# feed costs one message per frame instead of one per append and memory stays
+# at `window` rows however long the feed runs.
+#
+# Where the installed Streamlit has add_rows, each frame sends only the rows
+# added since the previous one and the browser keeps the whole series.
+# Recent Streamlit releases removed add_rows; there each frame redraws the
+# chart with the rows in the window, so older points drop off the chart.
+
+
+class StreamingSeries:
+    """Line chart of a live series, drawn into a placeholder.
+
+    `incremental` tells whether the chart receives only new rows and keeps
+    the whole series, or is redrawn with the last `window` rows.
+    """
+
+    def __init__(self, placeholder, columns=1, window=1000, fps=10):
+        self.placeholder = placeholder
+        self.columns = columns
+        self.window = window
+        self.interval = 1 / fps
+        # DeltaGenerator answers every attribute, so look at its class
+        self.incremental = hasattr(type(placeholder), "add_rows")
+        self._values = np.empty((window, columns))
+        self._count = 0
+        self._drawn = 0
+        self._chart = None
+        self._last_flush = -np.inf
+
+    def __len__(self):
+        return min(self._count, self.window)
+
+    def append(self, rows):
+        """Add rows to the series, redrawing the chart if a frame is due."""
+        rows = np.asarray(rows, dtype=float).reshape(-1, self.columns)
+        # Rows that are pushed out of the window before the next frame are never drawn
+        skipped = max(len(rows) - self.window, 0)
+        positions = (self._count + skipped + np.arange(len(rows) - skipped)) % self.window
+        self._values[positions] = rows[skipped:]
+        self._count += len(rows)
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def last(self):
+        """Return the most recent row."""
+        return self._values[(self._count - 1) % self.window]
+
+    def frame(self, start=0):
+        """Return the rows in the window from position `start` on, oldest first, indexed by position."""
+        first = max(start, self._count - len(self))
+        positions = np.arange(first, self._count) % self.window
+        return pd.DataFrame(self._values[positions], index=np.arange(first, self._count))
+
+    def flush(self):
+        """Update the chart if rows were added since the last frame."""
+        if self._drawn == self._count:
+            return
+        if self._chart is None or not self.incremental:
+            self._chart = self.placeholder.line_chart(self.frame())
+        else:
+            # Rows pushed out of the window since the last frame are not sent
+            self._chart.add_rows(self.frame(self._drawn))
+        self._drawn = self._count
+        self._last_flush = time.monotonic()
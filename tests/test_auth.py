@@ -0,0 +1,78 @@
+import os
+import shutil
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import auth
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "config.yaml"
+    shutil.copy(os.path.join(ROOT, "config.yaml"), path)
+    return str(path)
+
+
+def login_page(config_path):
+    import streamlit as st
+
+    from auth import get_authenticator
+
+    authenticator = get_authenticator(config_path)
+    authenticator.login()
+    decode = authenticator.cookie_controller.cookie_model._token_decode
+    st.session_state["token_checks_cached"] = decode.__name__ == "token_decode"
+
+
+def log_in(config_path, username, password):
+    app = AppTest.from_function(login_page, args=(config_path,), default_timeout=30)
+    app.run()
+    app.text_input[0].input(username)
+    app.text_input[1].input(password)
+    app.button[0].click().run()
+    assert not app.exception, [e.value for e in app.exception]
+    return app
+
+
+def test_login_with_cached_token_checks(config_path):
+    app = log_in(config_path, "jsmith", "abc")
+    assert app.session_state["authentication_status"] is True
+    assert app.session_state["token_checks_cached"] is True
+
+
+def test_token_checks_fall_back_when_hook_is_missing():
+    class Authenticator:
+        pass
+
+    assert auth._cache_token_checks(Authenticator()) is False
+
+
+def test_store_users_are_looked_up_not_copied(config_path, tmp_path, monkeypatch):
+    import users
+
+    def usernames(store):
+        raise AssertionError("every user in the store was read")
+
+    users_db = tmp_path / "users.db"
+    monkeypatch.setenv("FINOBI_USERS_DB", str(users_db))
+    # Listing the users is the first step of the library copying them
+    monkeypatch.setattr(users.UserStore, "usernames", usernames)
+
+    app = log_in(config_path, "rbriggs", "def")
+    assert app.session_state["authentication_status"] is True
+    assert app.session_state["name"] == "Rebecca Briggs"
+    # The new database was created from the config, and the login written to it
+    assert users.UserStore(str(users_db)).get("rbriggs")["logged_in"] == 1
+
+
+def test_failed_logins_are_counted_in_the_store(config_path, tmp_path, monkeypatch):
+    import users
+
+    users_db = tmp_path / "users.db"
+    monkeypatch.setenv("FINOBI_USERS_DB", str(users_db))
+    app = log_in(config_path, "jsmith", "wrong")
+    assert app.session_state["authentication_status"] is False
+    assert users.UserStore(str(users_db)).get("jsmith")["failed_login_attempts"] == 1
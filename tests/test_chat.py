@@ -0,0 +1,44 @@
+import pytest
+
+import chat
+import chat_stub
+from chat import ResponseCache, hashed_embedding
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    chat_stub.CompletionsHandler.delay = 0
+    server = chat_stub.serve()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+
+def ask(cache, base_url, question):
+    messages = [{"role": "assistant", "content": "How can I help you?"}, {"role": "user", "content": question}]
+    return "".join(cache.stream("test-key", "gpt-3.5-turbo", messages, base_url=base_url))
+
+
+def test_page_cache_has_no_similarity_fallback():
+    assert chat.response_cache.embed is None
+
+
+def test_repeated_question_is_answered_from_cache(base_url):
+    cache = ResponseCache(embed=hashed_embedding)
+    first = ask(cache, base_url, "How much super do I need?")
+    assert ask(cache, base_url, "How much super do I need?") == first
+    assert (cache.exact_hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize("question, variant", [
+    ("How much super do I need?", "How much super do I need at 60?"),
+    ("Can I withdraw 4% a year?", "Can I withdraw 8% a year?"),
+    ("I am 30", "I am 50"),
+    ("What if returns are -5% a year?", "What if returns are 5% a year?"),
+])
+@pytest.mark.parametrize("embed", [None, hashed_embedding])
+def test_numeric_variants_miss_the_cache(base_url, question, variant, embed):
+    cache = ResponseCache(embed=embed)
+    ask(cache, base_url, question)
+    assert ask(cache, base_url, variant) == f"You said: {variant}"
+    assert cache.misses == 2
+    assert cache.exact_hits == cache.similar_hits == 0
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+import datasets
+from datasets import DatasetUnavailableError
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(datasets, "_loaded", {})
+    return tmp_path
+
+
+@pytest.mark.parametrize("source", [
+    # Nothing listens on the discard port, so the connection is refused
+    "http://127.0.0.1:9/bike_rental_stats.json",
+    "/nonexistent/bike_rental_stats.json",
+])
+def test_unreachable_source_raises_dataset_unavailable(store, monkeypatch, source):
+    monkeypatch.setitem(datasets.SOURCES, "bike_rental_stats", (source, pd.read_json))
+    with pytest.raises(DatasetUnavailableError) as raised:
+        datasets.load_records("bike_rental_stats")
+    assert raised.value.name == "bike_rental_stats"
+    assert raised.value.source == source
+    assert not (store / "bike_rental_stats.arrow").exists()
+
+
+def test_local_copy_is_imported_and_loaded(store, tmp_path_factory):
+    source = tmp_path_factory.mktemp("source") / "bart_stop_stats.json"
+    pd.DataFrame({"name": ["A", "B"], "lon": [1.0, 2.0], "lat": [3.0, 4.0]}).to_json(source)
+    datasets.import_dataset("bart_stop_stats", str(source))
+    assert datasets.load_records("bart_stop_stats") == [
+        {"name": "A", "lon": 1.0, "lat": 3.0},
+        {"name": "B", "lon": 2.0, "lat": 4.0},
+    ]
+
+
+def test_version_changes_when_the_dataset_is_imported_again(store, tmp_path_factory):
+    source = tmp_path_factory.mktemp("source") / "bart_stop_stats.json"
+    pd.DataFrame({"name": ["A"], "lon": [1.0], "lat": [3.0]}).to_json(source)
+    datasets.import_dataset("bart_stop_stats", str(source))
+    version = datasets.dataset_version("bart_stop_stats")
+    assert datasets.dataset_version("bart_stop_stats") == version
+
+    pd.DataFrame({"name": ["B"], "lon": [1.0], "lat": [3.0]}).to_json(source)
+    datasets.import_dataset("bart_stop_stats", str(source))
+    assert datasets.dataset_version("bart_stop_stats") != version
+    assert datasets.load_records("bart_stop_stats") == [{"name": "B", "lon": 1.0, "lat": 3.0}]
@@ -0,0 +1,44 @@
+import threading
+
+import numpy as np
+
+import julia
+from result_cache import DiskCache, ResultCache
+
+
+def test_frames_reuse_a_bounded_set_of_renderers(tmp_path, monkeypatch):
+    monkeypatch.setattr(julia, "frame_cache", ResultCache(maxsize=None))
+    monkeypatch.setattr(julia, "frame_disk_cache", DiskCache(str(tmp_path)))
+    monkeypatch.setattr(julia, "_idle_renderers", {})
+    monkeypatch.setattr(julia, "MAX_IDLE_RENDERERS", 2)
+    created = []
+    renderer_class = julia.JuliaRenderer
+
+    def renderer(*args):
+        created.append(renderer_class(*args))
+        return created[-1]
+
+    monkeypatch.setattr(julia, "JuliaRenderer", renderer)
+
+    def play():
+        for _ in julia.render_frames(0.7885, 20, frames=12, width=96, height=64, scale=40, prefetch=4):
+            pass
+
+    threads = [threading.Thread(target=play) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert created
+    assert sum(map(len, julia._idle_renderers.values())) <= 2
+    assert julia.shared_executor()._max_workers <= 8
+
+
+def test_borrowed_renderer_matches_a_fresh_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(julia, "frame_cache", ResultCache(maxsize=None))
+    monkeypatch.setattr(julia, "frame_disk_cache", DiskCache(str(tmp_path)))
+    c = 0.7885 * np.exp(1j)
+    first = julia._render_frame("a", (64, 96), 40, c, 20)
+    second = julia._render_frame("b", (64, 96), 40, c, 20)
+    assert first == second == julia.encode_png(julia.frame_image(julia.JuliaRenderer(96, 64, 40).render(c, 20)))
@@ -0,0 +1,21 @@
+import sys
+
+import lazy_import
+import timing
+from lazy_import import lazy_import as lazy
+
+
+def test_module_is_imported_on_first_use(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    colorsys = lazy("colorsys")
+    assert "colorsys" not in sys.modules
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1)
+    assert "colorsys" in sys.modules
+    assert lazy_import.import_times["colorsys"] >= 0
+
+
+def test_import_times_are_exported_with_the_metrics(monkeypatch):
+    monkeypatch.setitem(lazy_import.import_times, "openai", 0.25)
+    text = timing.Timings().prometheus_text()
+    assert "# TYPE finobi_lazy_import_seconds gauge" in text
+    assert 'finobi_lazy_import_seconds{module="openai"} 0.25' in text
@@ -0,0 +1,45 @@
+import numpy as np
+
+import montecarlo
+
+BALANCE = dict(
+    current_age=30, super_bal=250000, annual_contribution=10000, retirement_age=60, roi=7,
+    inflation_rate=2, income_replacement_ratio=70, life_expectancy=90,
+)
+
+
+def test_million_paths_split_into_enough_shards_for_many_cores(monkeypatch):
+    sizes = []
+
+    def simulate_shard(simulate_chunk, years, seed_sequence, paths, chunk_size, params):
+        sizes.append(paths)
+        return montecarlo.SimulationSummary(years)
+
+    monkeypatch.setattr(montecarlo, "_simulate_shard", simulate_shard)
+    montecarlo.simulate_balance(**BALANCE, paths=1000000, seed=0)
+    assert len(sizes) == 100
+    assert sum(sizes) == 1000000
+
+
+def test_parallel_run_matches_serial_run():
+    serial = montecarlo.simulate_balance(**BALANCE, paths=50000, seed=7)
+    parallel = montecarlo.simulate_balance(**BALANCE, paths=50000, seed=7, parallel=True)
+    quantiles = (0.05, 0.5, 0.95)
+    for q in quantiles:
+        np.testing.assert_array_equal(serial.bands(quantiles)[q], parallel.bands(quantiles)[q])
+    np.testing.assert_array_equal(serial.ruin_probability(), parallel.ruin_probability())
+
+
+def test_seeded_runs_are_reused(monkeypatch):
+    montecarlo.simulation_cache.clear()
+    first = montecarlo.simulate_balance(**BALANCE, paths=20000, seed=1)
+    monkeypatch.setattr(montecarlo, "simulate", None)
+    assert montecarlo.simulate_balance(**BALANCE, paths=20000, seed=1) is first
+    assert montecarlo.simulate_balance(**{**BALANCE, "roi": 7.0}, paths=20000, seed=1) is first
+
+
+def test_unseeded_runs_are_not_cached():
+    montecarlo.simulation_cache.clear()
+    first = montecarlo.simulate_balance(**BALANCE, paths=20000)
+    assert montecarlo.simulate_balance(**BALANCE, paths=20000) is not first
+    assert montecarlo.simulation_cache.stats()["size"] == 0
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from projection import CashflowProjection, calculate_cashflows
+
+INPUTS = dict(
+    current_age=30, retirement_age=60, initial_super_bal=250000,
+    initial_asset_balances={"Superannuation": 0, "Shares": 50000},
+    annual_super_contribution=10000, annual_asset_contributions={"Superannuation": 0, "Shares": 5000},
+    initial_expenses={"Liabilities": 20000}, annual_expenses=40000, monthly_expenses=3000,
+    asset_rois={"Superannuation": 7, "Shares": 5}, liability_roi=3, inflation_rate=2, life_expectancy=85,
+)
+
+# Each step changes the inputs of the one before it
+STEPS = [
+    {},
+    {"retirement_age": 65},
+    {"retirement_age": 55},
+    {"life_expectancy": 95},
+    {"life_expectancy": 80},
+    {"liability_roi": 6},
+    # Negative liabilities are clamped to zero from the first projected year
+    {"initial_expenses": {"Liabilities": -30000}},
+    {"liability_roi": 1, "retirement_age": 70},
+    {"current_age": 40, "retirement_age": 62},
+    {"monthly_expenses": 3500, "life_expectancy": 100},
+    {"asset_rois": {"Superannuation": 4, "Shares": 9}},
+    {"current_age": 35},
+]
+
+
+def assert_matches(projection, inputs):
+    expected = calculate_cashflows(**inputs)
+    actual = projection.update(**inputs)
+    for want, got in zip(expected, actual):
+        np.testing.assert_allclose(got, want, rtol=1e-12, atol=1e-6)
+
+
+def test_updates_match_a_full_projection():
+    projection = CashflowProjection()
+    inputs = dict(INPUTS)
+    for step in STEPS:
+        inputs.update(step)
+        assert_matches(projection, inputs)
+
+
+def test_random_updates_match_a_full_projection():
+    rng = np.random.default_rng(8)
+    projection = CashflowProjection()
+    inputs = dict(INPUTS)
+    for _ in range(300):
+        current_age = int(rng.integers(20, 60)) if rng.random() < 0.1 else inputs["current_age"]
+        inputs.update(
+            current_age=current_age,
+            retirement_age=int(rng.integers(current_age + 1, 80)),
+            life_expectancy=int(rng.integers(max(80, current_age + 1), 101)),
+        )
+        if rng.random() < 0.3:
+            inputs["liability_roi"] = int(rng.integers(0, 10))
+        if rng.random() < 0.2:
+            inputs["initial_expenses"] = {"Liabilities": int(rng.integers(-50000, 50000))}
+        if rng.random() < 0.2:
+            inputs["monthly_expenses"] = int(rng.integers(1000, 6000))
+        assert_matches(projection, inputs)
+
+
+@pytest.fixture
+def projection():
+    projection = CashflowProjection()
+    projection.update(**INPUTS)
+    return projection
+
+
+def test_liability_rate_change_recomputes_only_liabilities(projection):
+    projection.update(**{**INPUTS, "liability_roi": 6})
+    periods = INPUTS["life_expectancy"] - INPUTS["current_age"] + 1
+    assert projection.recomputed == {
+        "super_contribution": 0, "super_balance": 0, "total_assets": 0,
+        "liabilities": periods, "monthly_expense": 0, "net_worth": periods,
+    }
+
+
+def test_retirement_age_change_recomputes_super_from_the_earlier_age(projection):
+    projection.update(**{**INPUTS, "retirement_age": 65})
+    # Contributions first differ in the year after age 60
+    changed = INPUTS["life_expectancy"] - 60
+    assert projection.recomputed == {
+        "super_contribution": changed, "super_balance": changed, "total_assets": 0,
+        "liabilities": 0, "monthly_expense": 0, "net_worth": changed,
+    }
@@ -0,0 +1,73 @@
+import os
+
+from result_cache import DiskCache, ResultCache
+
+
+def test_entries_are_evicted_by_total_bytes():
+    cache = ResultCache(maxsize=None, max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")
+    cache.put("c", b"1234")
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == b"1234"
+    stats = cache.stats()
+    assert (stats["bytes"], stats["evictions"]) == (8, 1)
+
+
+def test_replacing_an_entry_updates_the_total():
+    cache = ResultCache(maxsize=None, max_bytes=10)
+    cache.put("a", b"12345678")
+    cache.put("a", b"12")
+    cache.put("b", b"12345678")
+    assert cache.stats()["bytes"] == 10
+    assert cache.get("a") == b"12"
+
+
+def test_value_larger_than_the_bound_is_not_stored():
+    cache = ResultCache(maxsize=None, max_bytes=4)
+    cache.put("a", b"12")
+    cache.put("b", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12"
+
+
+def test_count_bound_still_applies():
+    cache = ResultCache(maxsize=2)
+    for key in "abc":
+        cache.put(key, key)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 2
+
+
+def directory_bytes(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory))
+
+
+def test_disk_cache_only_scans_when_its_count_passes_the_bound(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=100 * 1024)
+    scans = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda target: scans.append(target) or evict(target))
+
+    for i in range(100):
+        cache.put(f"frame-{i}", bytes(1024))
+    # Only the first write scanned, to count what was already there
+    assert len(scans) == 1
+
+    for i in range(100, 200):
+        cache.put(f"frame-{i}", bytes(1024))
+        assert directory_bytes(tmp_path) <= 100 * 1024
+    # Each scan frees a quarter of the bound
+    assert len(scans) <= 5
+    assert cache.get("frame-199") == bytes(1024)
+
+
+def test_disk_cache_counts_replaced_entries_once(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"12345678")
+    cache.put("a", b"12")
+    cache.put("b", b"12345678")
+    assert cache.get("a") == b"12"
+    assert cache._bytes == directory_bytes(tmp_path) == 10
@@ -0,0 +1,63 @@
+import numpy as np
+
+from streaming import StreamingSeries
+
+
+class Chart:
+    def __init__(self, frames):
+        self.frames = frames
+
+    def add_rows(self, frame):
+        self.frames.append(("add_rows", frame))
+        return self
+
+
+class Placeholder:
+    def __init__(self):
+        self.frames = []
+
+    def line_chart(self, frame):
+        self.frames.append(("line_chart", frame))
+        return Chart(self.frames)
+
+
+class AddRowsPlaceholder(Placeholder):
+    # Streamlit versions that still have add_rows
+    add_rows = Chart.add_rows
+
+
+def feed(placeholder, window):
+    series = StreamingSeries(placeholder, columns=1, window=window, fps=1e9)
+    values = np.arange(12.0).reshape(-1, 1)
+    for start in range(0, len(values), 3):
+        series.append(values[start:start + 3])
+    return series, values
+
+
+def test_incremental_chart_receives_only_new_rows():
+    placeholder = AddRowsPlaceholder()
+    series, values = feed(placeholder, window=5)
+    assert series.incremental
+    kinds = [kind for kind, _ in placeholder.frames]
+    assert kinds == ["line_chart", "add_rows", "add_rows", "add_rows"]
+    assert all(len(frame) == 3 for _, frame in placeholder.frames)
+    sent = np.concatenate([frame.to_numpy() for _, frame in placeholder.frames])
+    np.testing.assert_array_equal(sent, values)
+    assert list(placeholder.frames[-1][1].index) == [9, 10, 11]
+
+
+def test_redrawn_chart_shows_the_window():
+    placeholder = Placeholder()
+    series, values = feed(placeholder, window=5)
+    assert not series.incremental
+    assert [kind for kind, _ in placeholder.frames] == ["line_chart"] * 4
+    last = placeholder.frames[-1][1]
+    np.testing.assert_array_equal(last.to_numpy(), values[-5:])
+    assert list(last.index) == [7, 8, 9, 10, 11]
+
+
+def test_flush_without_new_rows_sends_nothing():
+    placeholder = AddRowsPlaceholder()
+    series, _ = feed(placeholder, window=5)
+    series.flush()
+    assert len(placeholder.frames) == 4
@@ -0,0 +1,42 @@
+import os
+import socket
+import subprocess
+import sys
+
+import timing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIMULATE = """
+import montecarlo, timing
+montecarlo.simulate_balance(
+    current_age=30, super_bal=250000, annual_contribution=10000, retirement_age=60, roi=7,
+    inflation_rate=2, income_replacement_ratio=70, life_expectancy=90, paths=50000, seed=3, parallel=True,
+)
+timing.timings.write(timing.os.environ["FINOBI_METRICS_FILE"])
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_pool_workers_leave_the_metrics_to_the_app(tmp_path):
+    metrics = tmp_path / "metrics.prom"
+    env = {**os.environ, "FINOBI_METRICS_FILE": str(metrics), "FINOBI_METRICS_PORT": str(free_port())}
+    result = subprocess.run([sys.executable, "-c", SIMULATE], cwd=ROOT, env=env, capture_output=True, text=True,
+                            timeout=120)
+    assert result.returncode == 0, result.stderr
+    # The parent wrote before its pool shut down, so a worker's exit write would have replaced it
+    assert 'stage="simulation"' in metrics.read_text()
+
+
+def test_stage_timings_are_exported_as_a_summary():
+    timings = timing.Timings()
+    for seconds in (0.1, 0.2, 0.3):
+        timings.record("5_retirement", "simulation", seconds)
+    text = timings.prometheus_text()
+    assert 'finobi_stage_seconds{page="5_retirement",stage="simulation",quantile="0.5"} 0.2' in text
+    assert 'finobi_stage_seconds_count{page="5_retirement",stage="simulation"} 3' in text
@@ -0,0 +1,209 @@
+import atexit
+import contextvars
+import functools
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from lazy_import import import_times
+
+
+# Stage timings for the pages.
+#
+# span(stage) times a block or, as a decorator, every call of a function,
+# under the page named by set_page(__file__) in the running page script.
+# Each (page, stage) keeps its most recent durations, from which p50, p95 and
+# p99 are computed when the metrics are read, along with a running count and
+# sum. The metrics are written in the Prometheus text format, to a file every
+# few seconds (FINOBI_METRICS_FILE, e.g. for node_exporter's textfile
+# collector) and/or at http://127.0.0.1:<FINOBI_METRICS_PORT>/metrics, along
+# with how long the first use of each lazily imported module took.
+#
+# With neither variable set, timing is disabled: span() returns a shared
+# object that does nothing, and functions decorated while disabled are left
+# unwrapped, so the pages pay only for a function call per block.
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_page = contextvars.ContextVar("page", default="app")
+
+
+def set_page(name):
+    """Attribute spans in the current script run to page `name`, or to a script path's file name."""
+    _page.set(os.path.splitext(os.path.basename(name))[0])
+
+
+class Timings:
+    """Durations by (page, stage), keeping the last `window` of each for quantiles."""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, page, stage, seconds):
+        key = (page, stage)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [deque(maxlen=self.window), 0, 0.0]
+            series[0].append(seconds)
+            series[1] += 1
+            series[2] += seconds
+
+    def summary(self):
+        """Return {(page, stage): {"count", "sum", 0.5, 0.95, 0.99}}, in seconds."""
+        with self._lock:
+            snapshot = {key: (np.array(recent), count, total) for key, (recent, count, total) in self._series.items()}
+        summary = {}
+        for key, (recent, count, total) in sorted(snapshot.items()):
+            summary[key] = {"count": count, "sum": total, **dict(zip(QUANTILES, np.quantile(recent, QUANTILES)))}
+        return summary
+
+    def prometheus_text(self):
+        """Return the timings as a Prometheus summary metric, and the lazy import times as a gauge."""
+        lines = [
+            "# HELP finobi_stage_seconds Time spent in each stage of a page rerun.",
+            "# TYPE finobi_stage_seconds summary",
+        ]
+        for (page, stage), stats in self.summary().items():
+            labels = f'page="{_escape(page)}",stage="{_escape(stage)}"'
+            for quantile in QUANTILES:
+                lines.append(f'finobi_stage_seconds{{{labels},quantile="{quantile}"}} {stats[quantile]:.6g}')
+            lines.append(f"finobi_stage_seconds_sum{{{labels}}} {stats['sum']:.6g}")
+            lines.append(f"finobi_stage_seconds_count{{{labels}}} {stats['count']}")
+        lines += [
+            "# HELP finobi_lazy_import_seconds Time taken to import a lazily imported module on first use.",
+            "# TYPE finobi_lazy_import_seconds gauge",
+        ]
+        for module, seconds in sorted(import_times.items()):
+            lines.append(f'finobi_lazy_import_seconds{{module="{_escape(module)}"}} {seconds:.6g}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the Prometheus text to `path`, replacing it atomically."""
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                file.write(self.prometheus_text())
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+timings = Timings()
+
+
+class Span:
+    """Times a block under a stage of the current page; also usable as a decorator."""
+
+    __slots__ = ("stage", "page", "_start")
+
+    def __init__(self, stage, page=None):
+        self.stage = stage
+        self.page = page
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        timings.record(self.page or _page.get(), self.stage, time.perf_counter() - self._start)
+
+    def __call__(self, function):
+        stage, page = self.stage, self.page
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            with Span(stage, page):
+                return function(*args, **kwargs)
+
+        return timed
+
+
+class _Disabled:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __call__(self, function):
+        return function
+
+
+_disabled = _Disabled()
+enabled = False
+
+
+def span(stage, page=None):
+    """Return a context manager / decorator timing `stage`, or a no-op one when timing is disabled."""
+    return Span(stage, page) if enabled else _disabled
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        payload = timings.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port=0):
+    """Serve the timings at /metrics on a background thread and return the server."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def _write_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        timings.write(path)
+
+
+def enable(path=None, port=None, interval=10):
+    """Turn timing on, writing the metrics to `path` every `interval` seconds and/or serving them on `port`."""
+    global enabled
+    enabled = True
+    if path:
+        threading.Thread(target=_write_periodically, args=(path, interval), name="metrics-writer", daemon=True).start()
+        atexit.register(timings.write, path)
+    if port:
+        serve_metrics(int(port))
+
+
+# Only the Streamlit process exports metrics: the Monte Carlo pool's workers
+# import this module too, and would otherwise bind the same port or overwrite
+# the file with their own, empty, timings.
+if multiprocessing.parent_process() is None and (
+    os.environ.get("FINOBI_METRICS_FILE") or os.environ.get("FINOBI_METRICS_PORT")
+):
+    enable(os.environ.get("FINOBI_METRICS_FILE"), os.environ.get("FINOBI_METRICS_PORT"))
@@ -0,0 +1,217 @@
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from collections.abc import MutableMapping
+
+import streamlit_authenticator as stauth
+
+
+# User accounts in an SQLite database.
+#
+# Lookups by username or email go through indexes, so they cost the same with
+# ten users or a hundred thousand, and counters such as failed login attempts
+# are updated in place by a single statement instead of rewriting a file. The
+# database runs in WAL mode so readers in every server process proceed while
+# one writes. UserMapping presents the store as the credentials['usernames']
+# mapping streamlit_authenticator expects, loading users only when asked for.
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL,
+    failed_login_attempts INTEGER NOT NULL DEFAULT 0,
+    logged_in INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email COLLATE NOCASE);
+"""
+
+FIELDS = ("username", "email", "name", "password", "failed_login_attempts", "logged_in")
+
+
+def _hashed(password):
+    return password if stauth.Hasher.is_hash(password) else stauth.Hasher.hash(password)
+
+
+class UserStore:
+    """Users in an SQLite database in WAL mode, with one connection per thread."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _one(self, query, *parameters):
+        row = self._connection().execute(query, parameters).fetchone()
+        return dict(row) if row is not None else None
+
+    def get(self, username):
+        """Return the user as a dict, or None."""
+        return self._one("SELECT * FROM users WHERE username = ?", username.lower())
+
+    def get_by_email(self, email):
+        return self._one("SELECT * FROM users WHERE email = ? COLLATE NOCASE", email)
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def usernames(self):
+        for row in self._connection().execute("SELECT username FROM users ORDER BY username"):
+            yield row[0]
+
+    def put(self, username, email, name, password, failed_login_attempts=0, logged_in=False):
+        """Add or replace a user; plain text passwords are hashed."""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)",
+            (username.lower(), email, name, _hashed(password), failed_login_attempts, bool(logged_in)),
+        )
+
+    def update(self, username, **fields):
+        """Set fields of a user; the password is hashed if given in plain text."""
+        if "password" in fields:
+            fields["password"] = _hashed(fields["password"])
+        for field in fields:
+            if field not in FIELDS:
+                raise KeyError(field)
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        self._connection().execute(
+            f"UPDATE users SET {assignments} WHERE username = ?", (*fields.values(), username.lower()),
+        )
+
+    def increment(self, username, field, amount=1):
+        """Atomically add `amount` to a counter and return its new value."""
+        if field != "failed_login_attempts":
+            raise KeyError(field)
+        row = self._connection().execute(
+            f"UPDATE users SET {field} = {field} + ? WHERE username = ? RETURNING {field}",
+            (amount, username.lower()),
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def delete(self, username):
+        self._connection().execute("DELETE FROM users WHERE username = ?", (username.lower(),))
+
+    def import_rows(self, rows):
+        """Add or replace users from dicts with FIELDS keys in one transaction; returns the count.
+
+        `username`, `email`, `name` and `password` are required. Hashing plain
+        text passwords dominates the cost, so import pre-hashed ones where
+        possible.
+        """
+        records = [
+            (
+                row["username"].lower(), row["email"], row["name"], _hashed(row["password"]),
+                int(row.get("failed_login_attempts") or 0),
+                str(row.get("logged_in", "")).lower() in ("1", "true"),
+            )
+            for row in rows
+        ]
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)", records)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return len(records)
+
+    def import_csv(self, path):
+        """Import users from a CSV file with a header row of FIELDS names."""
+        with open(path, newline="") as file:
+            return self.import_rows(csv.DictReader(file))
+
+    def import_credentials(self, credentials):
+        """Import the credentials['usernames'] mapping of a config.yaml."""
+        return self.import_rows(
+            {"username": username, **user} for username, user in credentials["usernames"].items()
+        )
+
+
+class UserRecord(MutableMapping):
+    """One user as a dict whose changes are written to the store."""
+
+    def __init__(self, store, user):
+        self._store = store
+        self._user = user
+
+    def __getitem__(self, key):
+        value = self._user[key]
+        return bool(value) if key == "logged_in" else value
+
+    def __setitem__(self, key, value):
+        username = self._user["username"]
+        if key == "failed_login_attempts" and value > self._user[key]:
+            # Increments from concurrent sessions must not overwrite each other
+            value = self._store.increment(username, key, value - self._user[key])
+        else:
+            self._store.update(username, **{key: value})
+        self._user[key] = value
+
+    def __delitem__(self, key):
+        raise TypeError("User fields cannot be removed")
+
+    def __iter__(self):
+        return (key for key in self._user if key != "username")
+
+    def __len__(self):
+        return len(self._user) - 1
+
+
+class UserMapping(MutableMapping):
+    """The store as a {username: user} mapping, for streamlit_authenticator's credentials."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, username):
+        user = self._store.get(username)
+        if user is None:
+            raise KeyError(username)
+        return UserRecord(self._store, user)
+
+    def __contains__(self, username):
+        return isinstance(username, str) and self._store.get(username) is not None
+
+    def __setitem__(self, username, user):
+        self._store.put(username, **dict(user))
+
+    def __delitem__(self, username):
+        self._store.delete(username)
+
+    def __iter__(self):
+        return self._store.usernames()
+
+    def __len__(self):
+        return self._store.count()
+
+
+if __name__ == "__main__":
+    # python users.py DATABASE users.csv|config.yaml
+    store = UserStore(sys.argv[1])
+    source = sys.argv[2]
+    if source.endswith((".yaml", ".yml")):
+        import yaml
+        from yaml.loader import SafeLoader
+
+        with open(source) as file:
+            count = store.import_credentials(yaml.load(file, Loader=SafeLoader)["credentials"])
+    elif os.path.getsize(source):
+        count = store.import_csv(source)
+    else:
+        count = 0
+    print(f"Imported {count} users into {sys.argv[1]}")
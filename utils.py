@@ -13,10 +13,34 @@
 # limitations under the License.
 
 import inspect
+import os
 import textwrap
+import threading
 
 import streamlit as st
 
+# Dedented source of each demo by (file, qualname), with the file's mtime
+# when it was read. Pages rerun often, so the file is only read and
+# tokenized again after it changes.
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def demo_source(demo):
+    """Return the dedented body of the demo function, without its def line."""
+    filename = inspect.getsourcefile(demo)
+    mtime = os.stat(filename).st_mtime_ns
+    key = (filename, demo.__qualname__)
+    with _sources_lock:
+        cached = _sources.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    sourcelines, _ = inspect.getsourcelines(demo)
+    source = textwrap.dedent("".join(sourcelines[1:]))
+    with _sources_lock:
+        _sources[key] = (mtime, source)
+    return source
+
 
 def show_code(demo):
     """Showing the code of the demo."""
@@ -24,5 +48,4 @@ def show_code(demo):
     if show_code:
         # Showing the code of the demo.
         st.markdown("## Code")
-        sourcelines, _ = inspect.getsourcelines(demo)
-        st.code(textwrap.dedent("".join(sourcelines[1:])))
+        st.code(demo_source(demo))